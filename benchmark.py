@@ -0,0 +1,208 @@
+"""Headless render benchmarks on synthetic timetables (no Streamlit needed).
+
+    python benchmark.py -o results.json                           # run and save the timings
+    python benchmark.py -o new.json --baseline results.json       # ...and exit 1 if a stage got slower
+    python benchmark.py --compare results.json new.json           # compare two saved runs only
+    python benchmark.py --quick                                   # fewer workloads and repeats, e.g. for CI
+
+Each workload is a synthetic week of courses (count, name kind, style). Every stage is timed separately;
+the median of the repeats is what gets compared.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import PIL
+
+import gen_file
+from encoding import PALETTE_COLORS, available_formats, encode_image, encode_images
+from gen_file import STYLES, create_background, draw_3d_effect_shadow, generate_timetable_image, get_image_size, layout_courses
+
+COURSE_COUNTS = (9, 50, 200, 500)
+NAME_KINDS = ('short', 'long', 'cjk')
+QUICK_COURSE_COUNTS = (9, 200)
+QUICK_NAME_KINDS = ('short', 'cjk')
+DEFAULT_REPEAT = 5
+QUICK_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25  # Fail when a stage's median is more than 25% slower than the baseline
+NOISE_FLOOR = 0.001  # Seconds; slowdowns smaller than this are timer noise, not regressions
+LONG_WORDS = ["Advanced", "Introduction", "Principles", "Computational", "Engineering", "Statistics",
+              "Laboratory", "Seminar", "Applied", "Theoretical", "Systems", "Analysis", "Design", "of", "and", "in"]
+
+
+# =========== Workloads ===========
+def synthetic_name(rng, kind, index):
+    if kind == 'short':
+        return f"Course {index}"
+    if kind == 'long':
+        return " ".join(rng.choice(LONG_WORDS) for _ in range(rng.randint(6, 12)))
+    # CJK names have no spaces, so wrap_text falls back to breaking between characters
+    return "".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(rng.randint(12, 40)))
+
+
+def synthetic_courses(count, name_kind='short', seed=0):
+    """`count` courses spread over one week, starting on the 10-minute grid between 8:00 and 20:00."""
+    rng = random.Random(seed)
+    courses = []
+    for index in range(count):
+        start = rng.randrange(8 * 60, 20 * 60, 10)
+        end = min(start + rng.choice((40, 50, 90, 100, 150)), 21 * 60 + 50)
+        location = synthetic_name(rng, name_kind, index) if name_kind != 'short' else f"Room {rng.randint(100, 599)}"
+        courses.append((synthetic_name(rng, name_kind, index), rng.randint(1, 7), start, end, location, 0))
+    return courses
+
+
+def workloads(quick=False):
+    """(name, courses, style): every density and name kind in one style, plus the other styles at 50 courses."""
+    counts, name_kinds = (QUICK_COURSE_COUNTS, QUICK_NAME_KINDS) if quick else (COURSE_COUNTS, NAME_KINDS)
+    for count in counts:
+        for name_kind in name_kinds:
+            yield f"fresh-{count}-{name_kind}", synthetic_courses(count, name_kind), 'fresh'
+    if not quick:
+        for style in STYLES:
+            if style != 'fresh':
+                yield f"{style}-50-short", synthetic_courses(50, 'short'), style
+
+
+# =========== Timing ===========
+def clear_render_caches():
+    """Forget cached backgrounds, shadows, base layers, text sizes and wraps (fonts stay loaded)."""
+    for cached in (gen_file._render_background, gen_file._render_shadow_sprite, gen_file._render_base_layer,
+                   gen_file.measure_text, gen_file._wrap_text_cached):
+        cached.cache_clear()
+
+
+def time_stage(run, setup=None, repeat=DEFAULT_REPEAT):
+    """Median and minimum seconds of `run()` over `repeat` runs; `setup()` runs untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()  # As timeit does, so a collection doesn't land in a random stage
+        try:
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return {'median': statistics.median(timings), 'min': min(timings)}
+
+
+def benchmark_workload(courses, style, scale=1.0, repeat=DEFAULT_REPEAT):
+    """Time each stage of rendering one workload; returns {stage: {'median', 'min'}} plus output sizes."""
+    width, height = get_image_size(scale)
+    colors = STYLES[style]['bg_colors']
+    img = generate_timetable_image(courses, style, scale=scale)  # Also loads the fonts before timing starts
+    course_colors = gen_file.assign_course_colors(courses, STYLES[style]['palette'])
+    blocks = list(layout_courses(courses, style, course_colors, width, height, scale))
+    canvas = create_background(width, height, colors).convert('RGBA')
+
+    def draw_shadows():
+        for box, radius, _, _ in blocks:
+            draw_3d_effect_shadow(canvas, box, radius, scale)
+
+    results = {
+        'generate_timetable_image': time_stage(lambda: generate_timetable_image(courses, style, scale=scale), clear_render_caches, repeat),
+        'generate_timetable_image_warm': time_stage(lambda: generate_timetable_image(courses, style, scale=scale), None, repeat),
+        'create_background': time_stage(lambda: create_background(width, height, colors), gen_file._render_background.cache_clear, repeat),
+        'draw_3d_effect_shadow': time_stage(draw_shadows, gen_file._render_shadow_sprite.cache_clear, repeat),
+        'encode_png': time_stage(lambda: encode_image(img, 'PNG', scale), None, repeat),
+        'encode_png_palette': time_stage(lambda: encode_image(img, 'PNG', scale, PALETTE_COLORS), None, repeat),
+        'encode_pdf': time_stage(lambda: encode_image(img, 'PDF', scale), None, repeat),
+        'encode_png_and_pdf': time_stage(lambda: encode_images(img, ('PNG', 'PDF'), scale), None, repeat),
+    }
+    if 'WEBP' in available_formats():
+        results['encode_webp'] = time_stage(lambda: encode_image(img, 'WEBP', scale), None, repeat)
+    sizes = {
+        'png_bytes': len(encode_image(img, 'PNG', scale)),
+        'png_palette_bytes': len(encode_image(img, 'PNG', scale, PALETTE_COLORS)),
+        'pdf_bytes': len(encode_image(img, 'PDF', scale)),
+    }
+    if 'WEBP' in available_formats():
+        sizes['webp_bytes'] = len(encode_image(img, 'WEBP', scale))
+    return results, sizes
+
+
+def run_benchmarks(quick=False, scale=1.0, repeat=None, log=print):
+    repeat = repeat or (QUICK_REPEAT if quick else DEFAULT_REPEAT)
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'scale': scale,
+            'repeat': repeat,
+        },
+        'workloads': {},
+    }
+    for name, courses, style in workloads(quick):
+        stages, sizes = benchmark_workload(courses, style, scale, repeat)
+        report['workloads'][name] = {'courses': len(courses), 'style': style, 'stages': stages, **sizes}
+        log(f"{name:<24}" + "  ".join(f"{stage} {timing['median'] * 1000:.1f}ms" for stage, timing in stages.items()))
+    return report
+
+
+# =========== Comparison ===========
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, noise_floor=NOISE_FLOOR):
+    """Stages whose median got more than `threshold` (a fraction) slower, as (workload, stage, old, new) tuples."""
+    regressions = []
+    for name, workload in current['workloads'].items():
+        old_stages = baseline['workloads'].get(name, {}).get('stages', {})
+        for stage, timing in workload['stages'].items():
+            if stage not in old_stages:
+                continue
+            old, new = old_stages[stage]['median'], timing['median']
+            if new > old * (1 + threshold) and new - old > noise_floor:
+                regressions.append((name, stage, old, new))
+    return regressions
+
+
+def _load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark timetable rendering on synthetic workloads.")
+    parser.add_argument('-o', '--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Results JSON to compare this run against")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="Compare two results files without running")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown per stage as a fraction (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--quick', action='store_true', help="Fewer workloads and repeats")
+    parser.add_argument('--repeat', type=int, help="Timed runs per stage")
+    parser.add_argument('--scale', type=float, default=1.0, help="Render scale (default: 1)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = map(_load_report, args.compare)
+    else:
+        baseline = _load_report(args.baseline) if args.baseline else None
+        current = run_benchmarks(args.quick, args.scale, args.repeat)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            print(f"Wrote {args.output}")
+        if baseline is None:
+            return 0
+
+    regressions = compare(baseline, current, args.threshold)
+    for name, stage, old, new in regressions:
+        print(f"REGRESSION {name} {stage}: {old * 1000:.1f}ms -> {new * 1000:.1f}ms ({new / old - 1:+.0%})")
+    if regressions:
+        return 1
+    print(f"No stage slower than the baseline by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""Week-indexed course storage for the Streamlit app.
+
+Courses live in typed columns (start/end already parsed to minutes after midnight) with an index
+from week offset to row ids, so adding or editing courses only touches the rows involved instead of
+concatenating and re-filtering one big DataFrame on every rerun.
+
+Recurring courses are kept as one rule per series (RRULE-like, with an exception list) and are only
+expanded for the week being shown.
+"""
+from array import array
+
+COLUMNS = ["Course", "Day", "Start", "End", "Location", "Week Offset"]
+SERIES_COLUMN = "Series"  # Id of the recurring series a row in week_frame() comes from, if any
+SERIES_COLUMNS = ["Course", "Days", "Start", "End", "Location", "First Week", "Every N Weeks", "Weeks", SERIES_COLUMN]
+MISSING = -1  # Stored for Day/Start/End cells that are empty or invalid (e.g. a half-filled editor row)
+WEEK_CACHE_SIZE = 64  # Expanded weeks of recurring courses kept in memory
+RRULE_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+MAX_WEEK_OFFSET = 52 * 100  # Week offsets are kept within +-100 years of the current week
+
+
+def parse_minutes(value):
+    """'9:40' / '09:40' -> 580; ints are taken as minutes already. Returns MISSING for empty or malformed values."""
+    if isinstance(value, str):
+        try:
+            hours, minutes = value.strip().split(':')[:2]
+            minutes = int(hours) * 60 + int(minutes)
+        except ValueError:
+            return MISSING
+    else:
+        minutes = _parse_int(value)
+    return minutes if 0 <= minutes < 24 * 60 else MISSING
+
+
+def format_minutes(minutes):
+    """580 -> '9:40'."""
+    return "" if minutes == MISSING else f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):  # None, NaN and friends
+        return MISSING
+
+
+def parse_week_offset(value):
+    """Week offset as an int (0 if empty); ValueError if it is further away than MAX_WEEK_OFFSET."""
+    week_offset = _parse_int(value)
+    week_offset = 0 if week_offset == MISSING else week_offset
+    if abs(week_offset) > MAX_WEEK_OFFSET:
+        raise ValueError(f"Week offset {week_offset} is out of range (at most {MAX_WEEK_OFFSET} weeks away)")
+    return week_offset
+
+
+def _text(value):
+    return value if isinstance(value, str) else ""
+
+
+def parse_days(value):
+    """'1,3,5' (or an int, or an iterable of ints) -> sorted tuple of valid days 1-7."""
+    if isinstance(value, str):
+        value = [part for part in value.replace(' ', '').split(',') if part]
+    elif not hasattr(value, '__iter__'):
+        value = [value]
+    return tuple(sorted({day for day in map(_parse_int, value) if 1 <= day <= 7}))
+
+
+class RecurrenceRule:
+    """A recurring course: the same slot on `days` of every `interval`-th week.
+
+    Starts at `first_week`, runs for `count` occurrences of the week pattern (None = no end), and
+    skips the (week offset, day) pairs in `exceptions`.
+    """
+
+    def __init__(self, course, days, start, end, location="", first_week=0, interval=1, count=None, exceptions=()):
+        self.course = _text(course)
+        self.days = parse_days(days)
+        self.start = parse_minutes(start)
+        self.end = parse_minutes(end)
+        self.location = _text(location)
+        self.first_week = _parse_int(first_week)
+        self.first_week = 0 if self.first_week == MISSING else self.first_week
+        self.interval = max(1, _parse_int(interval))
+        count = _parse_int(count)
+        self.count = None if count < 1 else count
+        self.exceptions = set(exceptions)
+
+    def occurs_in(self, week_offset):
+        weeks_since_start = week_offset - self.first_week
+        if weeks_since_start < 0 or weeks_since_start % self.interval:
+            return False
+        return self.count is None or weeks_since_start // self.interval < self.count
+
+    def expand(self, week_offset):
+        """Occurrences in one week as (course, day, start minutes, end minutes, location, week offset)."""
+        if not self.occurs_in(week_offset):
+            return ()
+        return tuple(
+            (self.course, day, self.start, self.end, self.location, week_offset)
+            for day in self.days if (week_offset, day) not in self.exceptions
+        )
+
+    def to_rrule(self):
+        """The rule as an iCalendar RRULE string (exceptions are kept separately, like EXDATE)."""
+        rule = f"FREQ=WEEKLY;INTERVAL={self.interval};BYDAY={','.join(RRULE_DAYS[day - 1] for day in self.days)}"
+        return rule if self.count is None else f"{rule};COUNT={self.count * len(self.days)}"
+
+
+class CourseStore:
+    """Columnar course table with a per-week index.
+
+    Deleted rows are tombstoned; the columns are compacted once tombstones make up half the table.
+    """
+
+    def __init__(self, rows=()):
+        self._series = {}  # Series id -> RecurrenceRule
+        self._next_series_id = 1
+        self._week_cache = {}  # Week offset -> expanded occurrences of all series
+        self._reset_rows()
+        self.extend(rows)
+
+    def _reset_rows(self):
+        self._names = []
+        self._days = array('b')
+        self._starts = array('h')
+        self._ends = array('h')
+        self._locations = []
+        self._weeks = array('i')
+        self._alive = array('b')
+        self._deleted = 0
+        self._by_week = {}  # Week offset -> list of row ids, in insertion order
+
+    def __len__(self):
+        return len(self._alive) - self._deleted
+
+    def add(self, course, day, start, end, location="", week_offset=0):
+        """Append one course and return its row id."""
+        row_id = len(self._alive)
+        week_offset = parse_week_offset(week_offset)  # Everything is parsed before any column is touched
+        day = _parse_int(day)
+        day = day if 1 <= day <= 7 else MISSING
+        start, end = parse_minutes(start), parse_minutes(end)
+        self._names.append(_text(course))
+        self._days.append(day)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._locations.append(_text(location))
+        self._weeks.append(week_offset)
+        self._alive.append(1)
+        self._by_week.setdefault(week_offset, []).append(row_id)
+        return row_id
+
+    def extend(self, rows):
+        """Append (course, day, start, end, location, week offset) rows."""
+        return [self.add(*row) for row in rows]
+
+    def extend_columns(self, courses, days, starts, ends, locations, week_offsets):
+        """Bulk-append already validated columns (days 1-7, times in minutes), e.g. from the importer.
+
+        Raises ValueError, leaving the store unchanged, if any column doesn't fit.
+        """
+        first_row_id = len(self._alive)
+        courses, locations = list(courses), list(locations)
+        try:
+            days, starts, ends, week_offsets = array('b', days), array('h', starts), array('h', ends), array('i', week_offsets)
+        except (OverflowError, TypeError) as e:
+            raise ValueError(f"Course columns out of range: {e}") from None
+        if len({len(courses), len(days), len(starts), len(ends), len(locations), len(week_offsets)}) > 1:
+            raise ValueError("Course columns differ in length")
+        if courses and not (1 <= min(days) and max(days) <= 7 and 0 <= min(starts) and 0 <= min(ends)
+                            and max(starts) < 24 * 60 and max(ends) < 24 * 60 and max(map(abs, week_offsets)) <= MAX_WEEK_OFFSET):
+            raise ValueError("Course columns out of range")
+        self._names.extend(courses)
+        self._days.extend(days)
+        self._starts.extend(starts)
+        self._ends.extend(ends)
+        self._locations.extend(locations)
+        self._weeks.extend(week_offsets)
+        self._alive.extend(bytes([1]) * len(courses))
+        for row_id, week_offset in enumerate(week_offsets, first_row_id):
+            self._by_week.setdefault(week_offset, []).append(row_id)
+
+    def weeks(self):
+        """Week offsets that have at least one course."""
+        return sorted(week for week, row_ids in self._by_week.items() if row_ids)
+
+    def week_row_ids(self, week_offset):
+        return list(self._by_week.get(week_offset, ()))
+
+    def row(self, row_id):
+        """Raw row: (course, day, start minutes, end minutes, location, week offset)."""
+        return (self._names[row_id], self._days[row_id], self._starts[row_id], self._ends[row_id],
+                self._locations[row_id], self._weeks[row_id])
+
+    def week_courses(self, week_offset):
+        """Renderable courses of one week, with start/end as minutes; incomplete rows are skipped."""
+        courses = []
+        for row_id in self._by_week.get(week_offset, ()):
+            course = self.row(row_id)
+            if course[0] and MISSING not in course[1:4]:
+                courses.append(course)
+        for _, occurrence in self._series_occurrences(week_offset):
+            if occurrence[0] and MISSING not in occurrence[1:4]:
+                courses.append(occurrence)
+        return courses
+
+    def has_courses(self, week_offset):
+        return bool(self._by_week.get(week_offset)) or bool(self._series_occurrences(week_offset))
+
+    def week_frame(self, week_offset):
+        """One week as a DataFrame with the app's column schema, for display and editing.
+
+        Rows expanded from a recurring series carry its id in the Series column.
+        """
+        import pandas as pd
+        rows = [(*self.row(row_id), None) for row_id in self._by_week.get(week_offset, ())]
+        rows += [(*occurrence, series_id) for series_id, occurrence in self._series_occurrences(week_offset)]
+        rows = [
+            (name, None if day == MISSING else day, format_minutes(start), format_minutes(end), location, week, series_id)
+            for name, day, start, end, location, week, series_id in rows
+        ]
+        return pd.DataFrame(rows, columns=COLUMNS + [SERIES_COLUMN]).astype({"Day": "Int64", SERIES_COLUMN: "Int64"})
+
+    # --- Recurring series ---
+    def add_series(self, rule):
+        """Store a RecurrenceRule and return its series id."""
+        series_id = self._next_series_id
+        self._next_series_id += 1
+        self._series[series_id] = rule
+        self._week_cache.clear()
+        return series_id
+
+    def series(self):
+        return dict(self._series)
+
+    def remove_series(self, series_id):
+        self._series.pop(series_id, None)
+        self._week_cache.clear()
+
+    def series_frame(self):
+        """All series as a DataFrame (SERIES_COLUMNS), for editing a whole series at once."""
+        import pandas as pd
+        rows = [
+            (rule.course, ','.join(map(str, rule.days)), format_minutes(rule.start), format_minutes(rule.end),
+             rule.location, rule.first_week, rule.interval, rule.count, series_id)
+            for series_id, rule in self._series.items()
+        ]
+        return pd.DataFrame(rows, columns=SERIES_COLUMNS).astype({"Weeks": "Int64", SERIES_COLUMN: "Int64"})
+
+    def replace_series(self, rows):
+        """Apply an edited series_frame(): update rules by id, add rows without an id, drop missing ids."""
+        kept = set()
+        for course, days, start, end, location, first_week, interval, count, series_id in rows:
+            series_id = _parse_int(series_id)
+            old = self._series.get(series_id)
+            rule = RecurrenceRule(course, days, start, end, location, first_week, interval, count,
+                                  old.exceptions if old else ())
+            if old is None:
+                series_id = self.add_series(rule)
+            else:
+                self._series[series_id] = rule
+            kept.add(series_id)
+        for series_id in set(self._series) - kept:
+            del self._series[series_id]
+        self._week_cache.clear()
+
+    def _series_occurrences(self, week_offset):
+        """(series id, occurrence) pairs for one week, expanded once and cached."""
+        occurrences = self._week_cache.get(week_offset)
+        if occurrences is None:
+            occurrences = tuple(
+                (series_id, occurrence)
+                for series_id, rule in self._series.items() for occurrence in rule.expand(week_offset)
+            )
+            if len(self._week_cache) >= WEEK_CACHE_SIZE:
+                del self._week_cache[next(iter(self._week_cache))]  # Drop the oldest expanded week
+            self._week_cache[week_offset] = occurrences
+        return occurrences
+
+    def remove(self, row_id):
+        if self._alive[row_id]:
+            self._by_week[self._weeks[row_id]].remove(row_id)
+            self._tombstone(row_id)
+            self._maybe_compact()
+
+    def replace_week(self, week_offset, rows):
+        """Replace all courses of a week, e.g. with the rows of an edited week_frame().
+
+        Rows keep their own week offset, so editing a row's week moves it. For rows that came from a
+        recurring series, an unchanged row stays part of the series; an edited one is detached into a
+        single course, and a deleted one becomes an exception of its series. Raises ValueError, before
+        changing anything, if a row's week offset is out of range.
+        """
+        rows = [tuple(row) for row in rows]
+        for row in rows:
+            parse_week_offset(row[5])
+        for row_id in self._by_week.pop(week_offset, ()):
+            self._tombstone(row_id)
+        self._maybe_compact()
+
+        expected = {}
+        for series_id, occurrence in self._series_occurrences(week_offset):
+            expected[(series_id, occurrence[1])] = occurrence
+        kept = set()
+        for row in rows:
+            row, series_id = row[:6], _parse_int(row[6]) if len(row) > 6 else MISSING
+            occurrence = expected.get((series_id, _parse_int(row[1])))
+            if occurrence is not None and self._normalize(row) == occurrence:
+                kept.add((series_id, occurrence[1]))
+            else:
+                self.add(*row)
+        for series_id, day in expected.keys() - kept:
+            self._series[series_id].exceptions.add((week_offset, day))
+            self._week_cache.pop(week_offset, None)
+
+    @staticmethod
+    def _normalize(row):
+        course, day, start, end, location, week_offset = row
+        return (_text(course), _parse_int(day), parse_minutes(start), parse_minutes(end), _text(location), _parse_int(week_offset))
+
+    def _tombstone(self, row_id):
+        self._alive[row_id] = 0
+        self._deleted += 1
+
+    def _maybe_compact(self):
+        if self._deleted * 2 > len(self._alive):
+            self._compact()
+
+    def _compact(self):
+        live = [self.row(row_id) for row_id in range(len(self._alive)) if self._alive[row_id]]
+        self._reset_rows()
+        self.extend(live)
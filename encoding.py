@@ -0,0 +1,76 @@
+"""Encoding rendered timetables to PNG / PDF / WebP / AVIF.
+
+A timetable is mostly a handful of flat colors, so an adaptive palette (`palette_colors`) makes PNGs
+less than half the size and is quicker to compress than full RGB. `compress_level` trades PNG size
+against CPU, `quality` does the same for WebP / AVIF. encode_images() encodes several formats at once
+on threads (Pillow releases the GIL while compressing), one per core, and reports output size and
+encode time.
+"""
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, features
+
+from profiling import NO_PROFILE
+
+PNG_COMPRESS_LEVEL = 6  # zlib level: 1 is fastest, 9 smallest; 6 is Pillow's default
+PALETTE_COLORS = 256  # Colors in the adaptive palette when quantizing
+LOSSY_QUALITY = 90  # WebP / AVIF quality
+MIME_TYPES = {'PNG': 'image/png', 'PDF': 'application/pdf', 'WEBP': 'image/webp', 'AVIF': 'image/avif'}
+
+
+def available_formats():
+    """Formats this Pillow build can write (WebP and AVIF depend on how it was compiled)."""
+    return [image_format for image_format in MIME_TYPES
+            if image_format in ('PNG', 'PDF') or features.check(image_format.lower())]
+
+
+def quantize(img, colors=PALETTE_COLORS):
+    """Reduce to an adaptive palette. Without dithering, flat blocks and text stay clean."""
+    return img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+
+def encode_image(img, image_format, scale=1.0, palette_colors=None, compress_level=PNG_COMPRESS_LEVEL, quality=LOSSY_QUALITY):
+    """Encode one RGB render to bytes.
+
+    `palette_colors` quantizes PNGs to that many colors (None keeps full color). PDFs always stay RGB,
+    Pillow writes palette images to PDF uncompressed.
+    """
+    image_format = image_format.upper()
+    if image_format not in available_formats():
+        raise ValueError(f"Can't encode {image_format}; this Pillow supports {', '.join(available_formats())}")
+    buffer = io.BytesIO()
+    if image_format == 'PNG':
+        if palette_colors and img.mode != 'P':
+            img = quantize(img, palette_colors)
+        img.save(buffer, format='PNG', compress_level=compress_level)
+    elif image_format == 'PDF':
+        img.save(buffer, format='PDF', resolution=72 * scale)  # Same page size at every scale
+    else:
+        img.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def encode_images(img, formats, scale=1.0, profile=NO_PROFILE, **options):
+    """Encode `img` into several formats concurrently, with encode_image() `options`.
+
+    Returns ({format: bytes}, {format: {'bytes': size, 'seconds': encode time}}).
+    """
+    def encode(image_format):
+        start = time.perf_counter()
+        data = encode_image(img, image_format, scale, **options)
+        return data, time.perf_counter() - start
+
+    formats = [image_format.upper() for image_format in formats]
+    workers = min(len(formats), os.cpu_count() or 1)
+    with profile.stage('encode'):
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = dict(zip(formats, executor.map(encode, formats)))
+        else:  # Threads would only take turns on a single core
+            results = {image_format: encode(image_format) for image_format in formats}
+    encoded = {image_format: data for image_format, (data, _) in results.items()}
+    report = {image_format: {'bytes': len(data), 'seconds': seconds} for image_format, (data, seconds) in results.items()}
+    return encoded, report
@@ -1,6 +1,18 @@
+import argparse
+import heapq
+import io
 import random
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import os
+import sys
+
+from profiling import NO_PROFILE, count_textbbox
 
 # Get script directory
 script_dir = os.path.dirname(__file__)
@@ -10,6 +22,16 @@ font_dir = os.path.join(script_dir, 'font')
 IMG_WIDTH = 1200
 IMG_HEIGHT = 1800
 PADDING = 50
+DEFAULT_FONT_SIZE = 10  # Size of Pillow's built-in font at 1x scale
+SHADOW_COLOR = (0, 0, 0, 40)  # Use semi-transparent black as a general shadow color
+
+# Cache sizes
+# Image caches are bounded by bytes: one 1x frame is ~8.6 MB, a 2x frame four times that
+BACKGROUND_CACHE_BYTES = 48 * 1024 * 1024  # Finished gradient backgrounds kept in memory
+SHADOW_CACHE_BYTES = 32 * 1024 * 1024  # Blurred shadow sprites kept in memory
+BASE_LAYER_CACHE_BYTES = 128 * 1024 * 1024  # Pre-rendered background + grid + headers kept in memory
+TEXT_SIZE_CACHE_SIZE = 8192  # Measured (font, text) sizes kept in memory
+WRAP_CACHE_SIZE = 2048  # Finished wrap_text layouts kept in memory
 
 # Layout dimensions
 HEADER_HEIGHT = 80
@@ -18,6 +40,8 @@ LEFT_AXIS_WIDTH = 60
 # Timetable definition
 DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 TIME_SLOTS = [f"{i}:00" for i in range(8, 22)]  # Time range: 8 AM to 9 PM
+DAY_START = int(TIME_SLOTS[0].split(':')[0]) * 60  # 8:00 in minutes; courses must lie within DAY_START-DAY_END
+DAY_END = int(TIME_SLOTS[-1].split(':')[0]) * 60  # 21:00
 
 # --- Requirement 4: Style Options ---
 # You can choose a preset style here: 'modern', 'cute', 'cool', 'fresh'
@@ -75,196 +99,665 @@ sample_courses = [
 
 
 # =========== 4. Helper Functions ===========
+def image_cache(max_bytes):
+    """Like lru_cache for functions returning PIL images, but bounded by the images' total size in bytes."""
+    def decorate(func):
+        cache = OrderedDict()  # Positional args -> image, least recently used first
+        lock = threading.Lock()
+        size = {'bytes': 0}
+
+        @wraps(func)
+        def cached(*args):
+            with lock:
+                img = cache.get(args)
+                if img is not None:
+                    cache.move_to_end(args)
+                    return img
+            img = func(*args)
+            img_bytes = _image_bytes(img)
+            with lock:
+                if args not in cache and img_bytes <= max_bytes:
+                    cache[args] = img
+                    size['bytes'] += img_bytes
+                    while size['bytes'] > max_bytes:
+                        size['bytes'] -= _image_bytes(cache.popitem(last=False)[1])
+            return img
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                size['bytes'] = 0
+
+        cached.cache_clear = cache_clear
+        cached.cache_info = lambda: {'entries': len(cache), 'bytes': size['bytes'], 'max_bytes': max_bytes}
+        return cached
+    return decorate
+
+
+def _image_bytes(img):
+    # Pillow keeps multi-band images (RGB too) at 4 bytes per pixel
+    return img.width * img.height * (1 if len(img.getbands()) == 1 else 4)
+
+
 def create_background(width, height, colors):
     """Requirement 1: Create a delicate gradient background that doesn't overpower the content."""
+    # Hand out a copy so callers can draw on it without touching the cached image
+    return _render_background(width, height, tuple(colors)).copy()
+
+
+@image_cache(BACKGROUND_CACHE_BYTES)
+def _render_background(width, height, colors):
+    """Build the gradient once per (width, height, colors); repeat renders reuse it."""
     base = Image.new('RGB', (width, height), colors[0])
     top = Image.new('RGB', (width, height), colors[1])
-    mask = Image.new('L', (width, height))
-    mask_data = [int(255 * (y / height)) for y in range(height) for _ in range(width)]
-    mask.putdata(mask_data)
+    # The gradient only varies by row, so build a single column and stretch it across
+    column = Image.frombytes('L', (1, height), bytes(int(255 * (y / height)) for y in range(height)))
+    mask = column.resize((width, height), Image.NEAREST)
     base.paste(top, (0, 0), mask)
     return base
 
 
-def draw_3d_effect_shadow(base_image, xy, radius):
+def draw_3d_effect_shadow(base_image, xy, radius, scale=1.0):
     """Requirement 6: Add a 3D effect by drawing a soft, blurred shadow."""
     x1, y1, x2, y2 = [int(v) for v in xy]
-    offset = 10
-    blur_radius = 8  # Shadow blur radius
-    shadow_color = (0, 0, 0, 40)  # Use semi-transparent black as a general shadow color
+    offset, blur_radius = get_shadow_metrics(scale)
+
+    # Only the area around the block is blurred; identical block sizes share one sprite
+    sprite = _render_shadow_sprite(x2 - x1, y2 - y1, radius, blur_radius)
+    pad = _shadow_padding(blur_radius)
+
+    # Composite the blurred shadow onto the main image
+    base_image.paste(sprite, (x1 - pad, y1 + offset - pad), sprite)
+
+
+def get_shadow_metrics(scale=1.0):
+    """Return (offset, blur_radius) of course block shadows at the given scale."""
+    return round(10 * scale), max(1, round(8 * scale))
+
+
+def _shadow_padding(blur_radius):
+    """Margin around a block wide enough to hold the whole blur falloff."""
+    return blur_radius * 3
+
+
+@image_cache(SHADOW_CACHE_BYTES)
+def _render_shadow_sprite(width, height, radius, blur_radius):
+    """Draw and blur a single shadow on a canvas cropped to the block plus padding."""
+    pad = _shadow_padding(blur_radius)
 
     # Draw shadow on a separate transparent layer for blurring
-    shadow_canvas = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
+    shadow_canvas = Image.new('RGBA', (width + 1 + 2 * pad, height + 1 + 2 * pad), (0, 0, 0, 0))
     shadow_draw = ImageDraw.Draw(shadow_canvas)
-    shadow_draw.rounded_rectangle((x1, y1 + offset, x2, y2 + offset), radius=radius, fill=shadow_color)
+    shadow_draw.rounded_rectangle((pad, pad, pad + width, pad + height), radius=radius, fill=SHADOW_COLOR)
 
     # Use Gaussian blur to create soft shadow edges
-    shadow_canvas = shadow_canvas.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-
-    # Composite the blurred shadow onto the main image
-    base_image.paste(shadow_canvas, (0, 0), shadow_canvas)
+    return shadow_canvas.filter(ImageFilter.GaussianBlur(radius=blur_radius))
 
 
 def get_text_size(draw, text, font):
     """Helper function to accurately calculate text size."""
+    count_textbbox()
     if hasattr(draw, 'textbbox'):
         bbox = draw.textbbox((0, 0), text, font=font)
         return bbox[2] - bbox[0], bbox[3] - bbox[1]
     else:  # Compatible with older Pillow versions
         return draw.textsize(text, font=font)
 
-def wrap_text(draw, text, font, max_width):
-    """Helper function to wrap text based on max_width."""
-    lines = []
-    if not text: return lines
+# Measuring only needs a drawing context, not the image being rendered
+_measure_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
 
-    # Handle Chinese characters: split by character if it's a single word that exceeds max_width
-    # For simplicity, we'll assume words are separated by spaces for English, and for Chinese,
-    # we'll try to fit as many characters as possible.
-    words = text.split(' ')
-    current_line = []
 
-    for word in words:
-        # Check if adding the next word (plus a space if it's not the first word) exceeds max_width
-        test_line = ' '.join(current_line + [word])
-        test_width, _ = get_text_size(draw, test_line, font)
+@lru_cache(maxsize=TEXT_SIZE_CACHE_SIZE)
+def measure_text(font, text):
+    """Cached get_text_size: each (font, text) pair is measured only once."""
+    return get_text_size(_measure_draw, text, font)
+
 
-        if test_width <= max_width:
-            current_line.append(word)
+def _fit_count(pieces, joiner, font, max_width, minimum):
+    """Largest n >= minimum such that joiner.join(pieces[:n]) fits in max_width."""
+    def fits(n):
+        return measure_text(font, joiner.join(pieces[:n]))[0] <= max_width
+
+    # Gallop forward so a short line never measures the whole remaining text, then binary search
+    lo, step = minimum, 1
+    while lo + step <= len(pieces) and fits(lo + step):
+        lo += step
+        step *= 2
+    hi = min(lo + step, len(pieces) + 1) - 1  # lo fits (or is the minimum), lo + step does not
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid):
+            lo = mid
         else:
-            # If current_line is not empty, add it to lines and start a new line with the current word
-            if current_line:
-                lines.append(' '.join(current_line))
-            current_line = [word]
-
-            # If even a single word exceeds max_width, try to break it down (e.g., for long Chinese words or very long English words)
-            word_width, _ = get_text_size(draw, word, font)
-            if word_width > max_width:
-                sub_word_line = []
-                for char in word:
-                    test_sub_word_line = ''.join(sub_word_line + [char])
-                    test_sub_word_width, _ = get_text_size(draw, test_sub_word_line, font)
-                    if test_sub_word_width <= max_width:
-                        sub_word_line.append(char)
-                    else:
-                        if sub_word_line:
-                            lines.append(''.join(sub_word_line))
-                        sub_word_line = [char]
-                if sub_word_line:
-                    lines.append(''.join(sub_word_line))
-                current_line = [] # Reset current_line as the word was fully processed
-
-    if current_line:
-        lines.append(' '.join(current_line))
-
-    return lines
+            hi = mid - 1
+    return lo
 
 
-# =========== 5. Main Generator Function ===========
-def generate_timetable_image(courses=sample_courses, selected_style='fresh', generate_png=True, generate_pdf=True, week_date_range=""):
-    """Integrate all elements to generate the final timetable image."""
-    style = STYLES[selected_style]
-    # Step 1: Create background
-    base_bg = create_background(IMG_WIDTH, IMG_HEIGHT, style['bg_colors'])
-    img = base_bg.convert('RGBA')  # Convert to RGBA mode to handle shadows with transparency
-    draw = ImageDraw.Draw(img)
+def wrap_text(draw, text, font, max_width):
+    """Helper function to wrap text based on max_width."""
+    if not text: return []
+    # The same course names repeat across weeks and styles, so whole layouts are memoized
+    return list(_wrap_text_cached(text, font, max_width))
 
-    # Step 2: Load fonts
-    font_regular = ImageFont.load_default()
-    font_bold = ImageFont.load_default()
-    font_course = ImageFont.load_default()
-    font_course_bold = ImageFont.load_default()
-    font_date_range = ImageFont.load_default()
 
-    if style['font_path']:
-        try:
-            font_regular = ImageFont.truetype(style['font_path'], 28)
-            font_course = ImageFont.truetype(style['font_path'], 24)
-        except IOError:
-            print(f"Tip: Font file not found! Please place font files like '{style['font_path']}' in the script directory. Default font will be used.")
-    
-    if style['font_bold_path']:
-        try:
-            font_bold = ImageFont.truetype(style['font_bold_path'], 40)
-            font_course_bold = ImageFont.truetype(style['font_bold_path'], 30)
-            font_date_range = ImageFont.truetype(style['font_bold_path'], 32) # New font for date range
-        except IOError:
-            print(f"Tip: Font file not found! Please place font files like '{style['font_bold_path']}' in the script directory. Default font will be used.")
-
-    # Step 3: Draw timetable grid and axes
-    grid_x_start = PADDING + LEFT_AXIS_WIDTH
-    grid_y_start = PADDING + HEADER_HEIGHT
-    grid_width = IMG_WIDTH - grid_x_start - PADDING
-    grid_height = IMG_HEIGHT - grid_y_start - PADDING
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def _wrap_text_cached(text, font, max_width):
+    lines = []
+
+    # Words are separated by spaces for English; a single word that exceeds max_width
+    # (e.g. long Chinese text) is split by character, fitting as many as possible per line.
+    # Line widths only grow as words/characters are added, so each break point is found
+    # by binary search instead of re-measuring after every word or character.
+    words = text.split(' ')
+    i = 0
+    while i < len(words):
+        count = _fit_count(words[i:], ' ', font, max_width, 0)
+        if count:
+            lines.append(' '.join(words[i:i + count]))
+            i += count
+            continue
+
+        # Even a single word exceeds max_width, break it down by character
+        word = words[i]
+        j = 0
+        while j < len(word):
+            count = _fit_count(word[j:], '', font, max_width, 1)  # Always take at least one character
+            lines.append(word[j:j + count])
+            j += count
+        i += 1
+
+    return tuple(lines)
+
+
+# =========== 5. Main Generator Function ===========
+class FontRegistry:
+    """Process-wide cache that resolves and loads each (font path, size) only once."""
+
+    def __init__(self, search_dirs=(font_dir, script_dir)):
+        self.search_dirs = search_dirs
+        self.hits = 0
+        self.misses = 0
+        self._fonts = {}
+        self._missing = set()  # Paths we already printed a tip for
+        self._lock = threading.Lock()
+
+    def resolve(self, font_path):
+        """Find a font file as given, then inside the font directory and the script directory."""
+        candidates = [font_path] + [os.path.join(d, font_path) for d in self.search_dirs]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+        return font_path  # Let Pillow try its own lookup (e.g. system fonts)
+
+    def get(self, font_path, size, fallback_size=None):
+        """Return the font for (font_path, size), falling back to the default font (at fallback_size) if it can't be loaded."""
+        key = (font_path, size, fallback_size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                return font
+            self.misses += 1
+            font = self._load(font_path, size, fallback_size)
+            self._fonts[key] = font
+            return font
+
+    def _load(self, font_path, size, fallback_size):
+        if font_path:
+            try:
+                return ImageFont.truetype(self.resolve(font_path), size)
+            except IOError:
+                if font_path not in self._missing:
+                    self._missing.add(font_path)
+                    print(f"Tip: Font file not found! Please place font files like '{font_path}' in the script directory. Default font will be used.")
+        if fallback_size is None:
+            return ImageFont.load_default()
+        return ImageFont.load_default(fallback_size)
+
+    def stats(self):
+        """Return cache hit/miss counts and the number of loaded fonts."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'fonts': len(self._fonts)}
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._missing.clear()
+            self.hits = self.misses = 0
+
+
+font_registry = FontRegistry()
+
+
+def load_fonts(style, scale=1.0):
+    """Load the regular, bold, course and date-range fonts for a style."""
+    def get(font_path, size):
+        # The built-in fallback font is scaled too, but left untouched at 1x
+        fallback_size = None if scale == 1 else max(1, round(DEFAULT_FONT_SIZE * scale))
+        return font_registry.get(font_path, max(1, round(size * scale)), fallback_size)
+
+    font_regular = get(style['font_path'], 28)
+    font_bold = get(style['font_bold_path'], 40)
+    font_course = get(style['font_path'], 24)
+    font_course_bold = get(style['font_bold_path'], 30)
+    font_date_range = get(style['font_bold_path'], 32) # New font for date range
+    return font_regular, font_bold, font_course, font_course_bold, font_date_range
+
+
+def get_image_size(scale=1.0):
+    """Return the (width, height) of a timetable rendered at the given scale."""
+    return round(IMG_WIDTH * scale), round(IMG_HEIGHT * scale)
+
+
+def get_grid_layout(width, height, scale=1.0):
+    """Return (grid_x_start, grid_y_start, grid_width, grid_height, col_width, row_height)."""
+    grid_x_start = (PADDING + LEFT_AXIS_WIDTH) * scale
+    grid_y_start = (PADDING + HEADER_HEIGHT) * scale
+    grid_width = width - grid_x_start - PADDING * scale
+    grid_height = height - grid_y_start - PADDING * scale
     col_width = grid_width / len(DAYS)
     row_height = grid_height / len(TIME_SLOTS)
+    return grid_x_start, grid_y_start, grid_width, grid_height, col_width, row_height
 
-    # Draw week date range
+
+def layout_base_layer(selected_style, width, height, week_date_range, scale=1.0):
+    """Lay out everything that does not depend on the courses.
+
+    Returns (texts, lines): texts are (x, y, text, font, color, bold) with (x, y) the top-left corner,
+    lines are (x1, y1, x2, y2, color, line_width). Shared by the raster and vector backends.
+    """
+    style = STYLES[selected_style]
+    font_regular, font_bold, _, _, font_date_range = load_fonts(style, scale)
+    grid_x_start, grid_y_start, grid_width, grid_height, col_width, row_height = get_grid_layout(width, height, scale)
+    texts, lines = [], []
+
+    # Week date range
     if week_date_range:
-        text_w, text_h = get_text_size(draw, week_date_range, font_date_range)
-        draw.text(((IMG_WIDTH - text_w) / 2, PADDING + 10), week_date_range, fill=style['font_color'], font=font_date_range)
+        text_w, text_h = measure_text(font_date_range, week_date_range)
+        texts.append(((width - text_w) / 2, (PADDING + 10) * scale, week_date_range, font_date_range, style['font_color'], True))
 
     for i, day in enumerate(DAYS):
-        text_w, text_h = get_text_size(draw, day, font_bold)
+        text_w, text_h = measure_text(font_bold, day)
         x = grid_x_start + i * col_width + (col_width - text_w) / 2
-        y = PADDING + (HEADER_HEIGHT - text_h) / 2 + 30 # Adjust Y to make space for date range
-        draw.text((x, y), day, fill=style['font_color'], font=font_bold)
+        y = (PADDING + HEADER_HEIGHT / 2 + 30) * scale - text_h / 2 # Adjust Y to make space for date range
+        texts.append((x, y, day, font_bold, style['font_color'], True))
 
     for i, time in enumerate(TIME_SLOTS):
         y = grid_y_start + i * row_height
-        text_w, _ = get_text_size(draw, time, font_regular)
-        draw.text((grid_x_start - text_w - 15, y - 8), time, fill=style['font_color'], font=font_regular)
-        draw.line([(grid_x_start - 5, y), (grid_x_start + grid_width, y)], fill=style['line_color'], width=1)
+        text_w, _ = measure_text(font_regular, time)
+        texts.append((grid_x_start - text_w - 15 * scale, y - 8 * scale, time, font_regular, style['font_color'], False))
+        lines.append((grid_x_start - 5 * scale, y, grid_x_start + grid_width, y, style['line_color'], max(1, round(scale))))
 
-    # Step 4: Draw all courses
-    course_colors = {}
-    color_palette = style['palette']
+    return texts, lines
 
-    for course_data in courses:
-        course_name, day_index, start_time, end_time, location, _ = course_data
 
-        # Assign a color to each course
+@image_cache(BASE_LAYER_CACHE_BYTES)
+def _render_base_layer(selected_style, width, height, week_date_range, scale=1.0):
+    """Draw everything that does not depend on the courses: background, date range, day headers and hour grid."""
+    style = STYLES[selected_style]
+    # Step 1: Create background
+    base_bg = create_background(width, height, style['bg_colors'])
+    img = base_bg.convert('RGBA')  # Convert to RGBA mode to handle shadows with transparency
+    draw = ImageDraw.Draw(img)
+
+    # Steps 2-3: Load fonts, draw timetable grid and axes
+    texts, lines = layout_base_layer(selected_style, width, height, week_date_range, scale)
+    for x, y, text, font, color, _ in texts:
+        draw.text((x, y), text, fill=color, font=font)
+    for x1, y1, x2, y2, color, line_width in lines:
+        draw.line([(x1, y1), (x2, y2)], fill=color, width=line_width)
+
+    return img
+
+
+def assign_course_colors(courses, palette, course_colors=None):
+    """Give every course name a palette color in order of first appearance, keeping existing assignments."""
+    course_colors = {} if course_colors is None else course_colors
+    for course_data in courses:
+        course_name = course_data[0]
         if course_name not in course_colors:
-            course_colors[course_name] = color_palette[len(course_colors) % len(color_palette)]
+            course_colors[course_name] = palette[len(course_colors) % len(palette)]
+    return course_colors
+
+
+def split_time(value):
+    """Return (hours, minutes) from an 'H:MM' string or from minutes after midnight (as kept by the course store)."""
+    if isinstance(value, str):
+        hours, minutes = map(int, value.split(':'))
+        return hours, minutes
+    return divmod(int(value), 60)
+
+
+def _to_minutes(value):
+    hours, minutes = split_time(value)
+    return hours * 60 + minutes
+
+
+def _sweep_overlaps(courses):
+    """Sweep each day's courses in start order, giving overlapping ones separate lanes.
+
+    Returns (lanes, groups): lanes[i] = (lane, lane_count) for courses[i], and groups lists the
+    indices of each cluster of courses that overlap (directly or through each other). O(n log n).
+    """
+    by_day = {}
+    for i, course_data in enumerate(courses):
+        by_day.setdefault(course_data[1], []).append((_to_minutes(course_data[2]), _to_minutes(course_data[3]), i))
+
+    lanes = [None] * len(courses)
+    groups = []
+    for items in by_day.values():
+        items.sort()
+        active = []  # Heap of (end, lane) for courses still running
+        free_lanes = []  # Heap of lanes freed up inside the current cluster
+        group, lane_count = [], 0
+        for start, end, i in items:
+            while active and active[0][0] <= start:  # Touching courses (end == start) don't clash
+                heapq.heappush(free_lanes, heapq.heappop(active)[1])
+            if not active and group:  # Nothing is running any more: the cluster is complete
+                groups.append(group)
+                for j in group:
+                    lanes[j] = (lanes[j], lane_count)
+                group, lane_count, free_lanes = [], 0, []
+            if free_lanes:
+                lane = heapq.heappop(free_lanes)
+            else:
+                lane, lane_count = lane_count, lane_count + 1
+            lanes[i] = lane
+            group.append(i)
+            heapq.heappush(active, (end, lane))
+        if group:
+            groups.append(group)
+            for j in group:
+                lanes[j] = (lanes[j], lane_count)
+    return lanes, groups
+
+
+def find_clashes(courses):
+    """Return the groups of courses that overlap in time on the same day (each group a list of courses)."""
+    _, groups = _sweep_overlaps(courses)
+    return [[courses[i] for i in sorted(group)] for group in groups if len(group) > 1]
+
+
+def layout_courses(courses, selected_style, course_colors, width, height, scale=1.0):
+    """Lay out course blocks.
+
+    Yields (box, radius, color, texts) per course, with box = (x1, y1, x2, y2) and texts as in layout_base_layer.
+    """
+    style = STYLES[selected_style]
+    _, _, font_course, font_course_bold, _ = load_fonts(style, scale)
+    grid_x_start, grid_y_start, grid_width, grid_height, col_width, row_height = get_grid_layout(width, height, scale)
+    block_radius = round(15 * scale)
+    text_color = style['text_on_course_color']
+    text_padding = 8 * scale
+    lane_gap = 4 * scale
+    # Clashing courses share their day column side by side instead of painting over each other
+    lanes, _ = _sweep_overlaps(courses)
+
+    for course_data, (lane, lane_count) in zip(courses, lanes):
+        course_name, day_index, start_time, end_time, location, _ = course_data
 
         # Calculate course block position and size
         day_col = day_index - 1
-        start_h, start_m = map(int, start_time.split(':'))
-        end_h, end_m = map(int, end_time.split(':'))
+        start_h, start_m = split_time(start_time)
+        end_h, end_m = split_time(end_time)
         start_row = (start_h - 8) + start_m / 60.0
         end_row = (end_h - 8) + end_m / 60.0
-        x1, y1 = grid_x_start + day_col * col_width + 8, grid_y_start + start_row * row_height + 4
-        x2, y2 = grid_x_start + (day_col + 1) * col_width - 8, grid_y_start + end_row * row_height - 4
+        x1, y1 = grid_x_start + day_col * col_width + 8 * scale, grid_y_start + start_row * row_height + 4 * scale
+        x2, y2 = grid_x_start + (day_col + 1) * col_width - 8 * scale, grid_y_start + end_row * row_height - 4 * scale
+        if lane_count > 1:
+            gap = min(lane_gap, (x2 - x1) / (2 * lane_count))  # Narrower gaps when so many lanes would leave no block
+            lane_width = (x2 - x1 - gap * (lane_count - 1)) / lane_count
+            x1 += lane * (lane_width + gap)
+            x2 = x1 + lane_width
+
+        texts = []
+        text_y_pos = y1 + 10 * scale
+        max_text_width = int(x2 - x1 - 2 * text_padding) # 8 pixels padding on each side
+
+        # Wrapped course name, then wrapped location text
+        location_text = f"@{location}" if location else ""
+        for text, font, bold in ((course_name, font_course_bold, True), (location_text, font_course, False)):
+            for line in wrap_text(_measure_draw, text, font, max_text_width):
+                text_w, text_h = measure_text(font, line)
+                texts.append((x1 + (max_text_width + 2 * text_padding - text_w) / 2, text_y_pos, line, font, text_color, bold))
+                text_y_pos += text_h + 2 * scale # Add a small line spacing
 
+        yield (x1, y1, x2, y2), block_radius, course_colors[course_name], texts
+
+
+def draw_courses(img, courses, selected_style, course_colors, scale=1.0, profile=NO_PROFILE):
+    """Draw course blocks (shadow, rounded block and wrapped text) onto an RGBA timetable image."""
+    with profile.stage('layout'):  # Block positions, lanes and text wrapping
+        blocks = list(layout_courses(courses, selected_style, course_colors, img.width, img.height, scale))
+    draw = ImageDraw.Draw(img)
+    for box, radius, color, texts in blocks:
         # Core drawing steps:
         # a. Draw shadow first for 3D effect (Requirement 6)
-        draw_3d_effect_shadow(img, (x1, y1, x2, y2), radius=15)
+        with profile.stage('shadows'):
+            draw_3d_effect_shadow(img, box, radius=radius, scale=scale)
         # b. Then draw rounded course blocks (Requirement 2 & 3)
-        draw.rounded_rectangle((x1, y1, x2, y2), radius=15, fill=course_colors[course_name])
         # c. Finally, draw course text
-        text_y_pos = y1 + 10
-        text_color = style['text_on_course_color']
-        max_text_width = int(x2 - x1 - 16) # 8 pixels padding on each side
-
-        # Draw wrapped course name
-        wrapped_course_name = wrap_text(draw, course_name, font_course_bold, max_text_width)
-        for line in wrapped_course_name:
-            text_w, text_h = get_text_size(draw, line, font_course_bold)
-            draw.text((x1 + (max_text_width + 16 - text_w) / 2, text_y_pos), line, fill=text_color, font=font_course_bold)
-            text_y_pos += text_h + 2 # Add a small line spacing
-
-        # Draw wrapped location text
-        location_text = f"@{location}" if location else ""
-        wrapped_location_text = wrap_text(draw, location_text, font_course, max_text_width)
-        for line in wrapped_location_text:
-            text_w, text_h = get_text_size(draw, line, font_course)
-            draw.text((x1 + (max_text_width + 16 - text_w) / 2, text_y_pos), line, fill=text_color, font=font_course)
-            text_y_pos += text_h + 2 # Add a small line spacing
+        with profile.stage('blocks_and_text'):
+            draw.rounded_rectangle(box, radius=radius, fill=color)
+            for x, y, text, font, text_color, _ in texts:
+                draw.text((x, y), text, fill=text_color, font=font)
+
+
+def generate_timetable_image(courses=sample_courses, selected_style='fresh', generate_png=True, generate_pdf=True, week_date_range="", scale=1.0, course_colors=None, backend='raster', profile=NO_PROFILE):
+    """Integrate all elements to generate the final timetable image.
+
+    `scale` multiplies the image size, layout, shadows and fonts, e.g. 0.5 for a quick preview or 2 for print.
+    `course_colors` optionally pins course names to palette colors; new names get the next free color.
+    `backend` is 'raster' (returns a PIL image), 'svg' (returns an SVG string) or 'pdf' (returns vector PDF bytes).
+    `profile` is an optional profiling.RenderProfile that records time spent per stage.
+    """
+    if backend != 'raster':
+        import vector_render # Imported lazily, it builds on this module
+        with profile.stage(f'{backend}_render'):
+            return vector_render.render_vector(courses, selected_style, week_date_range, scale, course_colors, backend)
+
+    style = STYLES[selected_style]
+    width, height = get_image_size(scale)
+    # Steps 1-3 only depend on style, size and week, so start from a copy of the cached base layer
+    with profile.stage('base_layer'):
+        img = _render_base_layer(selected_style, width, height, week_date_range, scale).copy()
 
-    final_img = img.convert('RGB')
+    # Step 4: Draw all courses
+    course_colors = assign_course_colors(courses, style['palette'], dict(course_colors or {}))
+    draw_courses(img, courses, selected_style, course_colors, scale, profile)
+
+    with profile.stage('convert_rgb'):
+        final_img = img.convert('RGB')
 
     return final_img
 
 
-# =========== 6. Script Entry Point ===========if __name__ == '__main__':
-    generate_timetable_image()
\ No newline at end of file
+class TimetableRenderer:
+    """Keeps the last rendered frame and only redraws the day columns whose courses changed.
+
+    Course colors are remembered across renders, so unchanged blocks keep their color when other courses are edited.
+    """
+
+    def __init__(self):
+        self.course_colors = {}
+        self._frame = None  # Last RGBA frame before conversion to RGB
+        self._final_img = None
+        self._settings = None  # (selected_style, week_date_range, scale) of the last frame
+        self._days = {}  # Day index -> tuple of that day's courses in the last frame
+
+    def render(self, courses, selected_style='fresh', week_date_range="", scale=1.0, profile=NO_PROFILE):
+        courses = [tuple(course_data) for course_data in courses]
+        settings = (selected_style, week_date_range, scale)
+        if settings[0] != (self._settings or (None,))[0]:
+            self.course_colors = {}  # Colors belong to a style's palette
+        assign_course_colors(courses, STYLES[selected_style]['palette'], self.course_colors)
+
+        days = _group_by_day(courses)
+        dirty_days = {day for day in days.keys() | self._days.keys() if days.get(day) != self._days.get(day)}
+        if settings != self._settings or len(dirty_days) > len(DAYS) // 2:
+            self._render_full(courses, selected_style, week_date_range, scale, profile)
+        elif dirty_days:
+            self._render_days(courses, dirty_days, selected_style, week_date_range, scale, profile)
+        else:
+            return self._final_img
+
+        self._settings = settings
+        self._days = days
+        with profile.stage('convert_rgb'):
+            self._final_img = self._frame.convert('RGB')
+        return self._final_img
+
+    def _render_full(self, courses, selected_style, week_date_range, scale, profile):
+        width, height = get_image_size(scale)
+        with profile.stage('base_layer'):
+            self._frame = _render_base_layer(selected_style, width, height, week_date_range, scale).copy()
+        draw_courses(self._frame, courses, selected_style, self.course_colors, scale, profile)
+
+    def _render_days(self, courses, dirty_days, selected_style, week_date_range, scale, profile):
+        width, height = get_image_size(scale)
+        grid_x_start, _, _, _, col_width, _ = get_grid_layout(width, height, scale)
+        # Shadows spill into the neighbouring columns, so those courses are redrawn as well
+        spill = _shadow_padding(get_shadow_metrics(scale)[1])
+        for day in dirty_days:
+            day_col = day - 1
+            neighbours = {day - 1, day, day + 1}
+            with profile.stage('base_layer'):
+                work = _render_base_layer(selected_style, width, height, week_date_range, scale).copy()
+            draw_courses(work, [c for c in courses if c[1] in neighbours], selected_style, self.course_colors, scale, profile)
+            box = (
+                max(0, int(grid_x_start + day_col * col_width) - spill), 0,
+                min(width, int(grid_x_start + (day_col + 1) * col_width) + spill + 1), height,
+            )
+            with profile.stage('paste_columns'):
+                self._frame.paste(work.crop(box), box[:2])
+
+
+def _group_by_day(courses):
+    days = {}
+    for course_data in courses:
+        days.setdefault(course_data[1], []).append(course_data)
+    return {day: tuple(day_courses) for day, day_courses in days.items()}
+
+
+# =========== 6. Batch Export ===========
+def get_current_week_dates(week_offset):
+    today = datetime.today()
+    # Find the most recent Monday (or today if today is Monday)
+    start_of_week = today - timedelta(days=today.weekday())
+    current_monday = start_of_week + timedelta(weeks=week_offset)
+    current_sunday = current_monday + timedelta(days=6)
+    return current_monday, current_sunday
+
+
+def get_week_date_range(week_offset):
+    """Title shown above the grid, e.g. '03-02 to 03-08'."""
+    current_monday, current_sunday = get_current_week_dates(week_offset)
+    return f"{current_monday.strftime('%m-%d')} to {current_sunday.strftime('%m-%d')}"
+
+
+def load_courses(path, week_offsets):
+    """Import a .csv or .ics file with the app's importer; returns (courses of `week_offsets`, import report)."""
+    from course_store import CourseStore
+    from importer import import_file  # Not at the top: importer imports this module
+
+    store = CourseStore()
+    report = import_file(path, path, store)
+    courses = [course for week_offset in sorted(set(week_offsets)) for course in store.week_courses(week_offset)]
+    return courses, report
+
+
+def _render_batch_page(job):
+    """Worker: render one (week offset, style) page. Returns PNG bytes, or the image itself for PDF assembly."""
+    week_courses, week_offset, selected_style, scale, output_format = job
+    img = generate_timetable_image(courses=week_courses, selected_style=selected_style, week_date_range=get_week_date_range(week_offset), scale=scale)
+    if output_format == 'pdf':
+        return img
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def export_batch(output_path, courses=sample_courses, week_offsets=range(8), styles=('fresh',), output_format='pdf', scale=1.0, workers=None):
+    """Render every (style, week offset) combination across a process pool.
+
+    Writes one multi-page PDF (a page per week, grouped by style) or a ZIP with one PNG per page.
+    Returns the list of page names in output order.
+    """
+    # Each job is pickled to its worker, so it only carries its own week's courses
+    courses_by_week = {}
+    for c in courses:
+        courses_by_week.setdefault(c[5], []).append(tuple(c))
+    pages = [(selected_style, week_offset) for selected_style in styles for week_offset in week_offsets]
+    jobs = [(courses_by_week.get(week_offset, []), week_offset, selected_style, scale, output_format) for selected_style, week_offset in pages]
+    names = [f"timetable_{selected_style}_week{week_offset}" for selected_style, week_offset in pages]
+    if not jobs:
+        raise ValueError("Nothing to export: no week offsets or styles given.")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_render_batch_page, jobs))
+
+    if output_format == 'pdf':
+        results[0].save(output_path, format="PDF", save_all=True, append_images=results[1:], resolution=72 * scale)
+    elif output_format == 'zip':
+        with zipfile.ZipFile(output_path, 'w') as archive:
+            for name, png_bytes in zip(names, results):
+                archive.writestr(f"{name}.png", png_bytes)  # PNG is already compressed
+    else:
+        raise ValueError(f"Unknown output format: {output_format!r}")
+    return names
+
+
+def _parse_week_offsets(value):
+    """Parse '0-7' or '0,2,5' into a list of week offsets; ValueError if that isn't what `value` is."""
+    offsets = []
+    for part in value.split(','):
+        try:
+            if '-' in part.strip()[1:]:
+                first, last = part.rsplit('-', 1)
+                offsets.extend(range(int(first), int(last) + 1))
+            else:
+                offsets.append(int(part))
+        except ValueError:
+            raise ValueError(f"invalid week offsets {value!r}, expected e.g. '0-7' or '0,2,5'") from None
+    if not offsets:
+        raise ValueError(f"no week offsets in {value!r}")
+    return offsets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render timetables for several weeks and styles into one PDF or a ZIP of PNGs.")
+    parser.add_argument('-o', '--output', help="Output file (default: timetable.pdf or timetable.zip)")
+    parser.add_argument('--courses', help="CSV (Course, Day, Start, End, Location, Week Offset) or .ics file (default: sample courses)")
+    parser.add_argument('--weeks', default='0-7', help="Week offsets, e.g. '0-7' or '0,2,5' (default: 0-7)")
+    parser.add_argument('--styles', default='fresh', help=f"Comma-separated styles or 'all' (choices: {', '.join(STYLES)})")
+    parser.add_argument('--format', choices=['pdf', 'zip'], default='pdf', dest='output_format')
+    parser.add_argument('--scale', type=float, default=1.0, help="Render scale, e.g. 2 for print (default: 1)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    styles = list(STYLES) if args.styles == 'all' else args.styles.split(',')
+    unknown = [name for name in styles if name not in STYLES]
+    if unknown:
+        parser.error(f"unknown style(s): {', '.join(unknown)}")
+    try:
+        week_offsets = _parse_week_offsets(args.weeks)
+    except ValueError as e:
+        parser.error(str(e))
+    courses = sample_courses
+    if args.courses:
+        try:
+            courses, report = load_courses(args.courses, week_offsets)
+        except (OSError, ValueError) as e:
+            parser.error(f"can't import {args.courses}: {e}")
+        if report['rows_rejected']:
+            print(f"Skipped {report['rows_rejected']} invalid row(s) in {args.courses}, e.g. "
+                  + "; ".join(f"row {row}: {reason}" for row, reason in report['rejected'][:5]), file=sys.stderr)
+    output = args.output or f"timetable.{args.output_format}"
+
+    names = export_batch(output, courses, week_offsets, styles, args.output_format, args.scale, args.workers)
+    print(f"Wrote {len(names)} page(s) to {output}")
+
+
+# =========== 7. Script Entry Point ===========
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""Streaming bulk import of CSV and iCalendar (.ics) schedules into a CourseStore.
+
+Files are read in chunks, days and times are parsed column-wise with pandas, rows outside the
+TIME_SLOTS range are rejected, and valid rows are appended to the store in bulk, so memory use
+depends on the chunk size rather than the file size.
+"""
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from course_store import COLUMNS, MAX_WEEK_OFFSET, RecurrenceRule, RRULE_DAYS
+from gen_file import DAY_END, DAY_START, TIME_SLOTS, get_current_week_dates
+
+CHUNK_SIZE = 5000  # Rows parsed per chunk
+MAX_REJECTED_SAMPLES = 20  # Rejected rows kept in the report, for showing to the user
+
+DAY_NAMES = {
+    **{name: i for i, name in enumerate(["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"], 1)},
+    **{name: i for i, name in enumerate(["mon", "tue", "wed", "thu", "fri", "sat", "sun"], 1)},
+    **{name.lower(): i for i, name in enumerate(RRULE_DAYS, 1)},
+    **{name: i for i, name in enumerate(["周一", "周二", "周三", "周四", "周五", "周六", "周日"], 1)},
+    **{name: i for i, name in enumerate(["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"], 1)},
+}
+
+
+def _new_report():
+    return {'rows_read': 0, 'rows_imported': 0, 'rows_rejected': 0, 'series_imported': 0,
+            'seconds': 0.0, 'rows_per_second': 0.0, 'rejected': []}
+
+
+def _finish_report(report, started):
+    report['seconds'] = time.perf_counter() - started
+    report['rows_per_second'] = report['rows_read'] / report['seconds'] if report['seconds'] else 0.0
+    return report
+
+
+def parse_day_column(days):
+    """Vectorized: 1-7 or day names (Monday, Mon, MO, 周一, ...) -> Int64 day 1-7, <NA> if invalid."""
+    text = days.astype("string").str.strip()
+    numeric = pd.to_numeric(text, errors='coerce')
+    named = text.str.lower().map(DAY_NAMES)
+    parsed = numeric.fillna(named)
+    return parsed.where(parsed.between(1, 7) & (parsed % 1 == 0)).astype("Int64")
+
+
+def parse_time_column(times):
+    """Vectorized: 'H:MM' / 'HH:MM[:SS]' -> Int64 minutes after midnight, <NA> if invalid."""
+    parts = times.astype("string").str.extract(r'^\s*(\d{1,2}):(\d{2})')
+    hours, minutes = pd.to_numeric(parts[0]), pd.to_numeric(parts[1])
+    total = hours * 60 + minutes
+    return total.where((hours < 24) & (minutes < 60)).astype("Int64")
+
+
+def load_chunk(chunk, store, report):
+    """Validate one DataFrame chunk with the app's column schema and append the valid rows to the store."""
+    report['rows_read'] += len(chunk)
+    day = parse_day_column(chunk["Day"])
+    start = parse_time_column(chunk["Start"])
+    end = parse_time_column(chunk["End"])
+    week = pd.to_numeric(chunk["Week Offset"], errors='coerce') if "Week Offset" in chunk else pd.Series(0, index=chunk.index)
+    course = chunk["Course"].astype("string").str.strip()
+    location = chunk["Location"].astype("string").fillna("") if "Location" in chunk else pd.Series("", index=chunk.index)
+
+    # Every check is a column-wise mask; a row is imported only if it passes all of them
+    reasons = pd.Series("", index=chunk.index)
+    reasons = reasons.mask(course.isna() | (course == ""), "missing course name")
+    reasons = reasons.mask((reasons == "") & day.isna(), "invalid day")
+    reasons = reasons.mask((reasons == "") & (start.isna() | end.isna()), "invalid start/end time")
+    reasons = reasons.mask((reasons == "") & ~(start < end).fillna(False), "end is not after start")
+    reasons = reasons.mask((reasons == "") & ~((start >= DAY_START) & (end <= DAY_END)).fillna(False),
+                           f"outside {TIME_SLOTS[0]}-{TIME_SLOTS[-1]}")
+    reasons = reasons.mask((reasons == "") & (week.isna() | (week % 1 != 0)), "invalid week offset")
+    reasons = reasons.mask((reasons == "") & (week.abs() > MAX_WEEK_OFFSET), "week offset out of range")
+    valid = (reasons == "").to_numpy()
+
+    rejected = (~valid).nonzero()[0]
+    report['rows_rejected'] += len(rejected)
+    first_row = report['rows_read'] - len(chunk) + 1  # 1-based row number of this chunk's first row
+    for position in rejected[:max(0, MAX_REJECTED_SAMPLES - len(report['rejected']))]:
+        report['rejected'].append((first_row + int(position), reasons.iloc[position]))
+
+    store.extend_columns(
+        course[valid].tolist(), day[valid].tolist(), start[valid].tolist(), end[valid].tolist(),
+        location[valid].tolist(), week[valid].astype(int).tolist(),
+    )
+    report['rows_imported'] += int(valid.sum())
+
+
+def import_csv(source, store, chunk_size=CHUNK_SIZE):
+    """Stream a CSV with Course, Day, Start, End, Location[, Week Offset] columns into the store."""
+    report = _new_report()
+    started = time.perf_counter()
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype="string", skipinitialspace=True)
+    for chunk in reader:
+        missing = {"Course", "Day", "Start", "End"} - set(chunk.columns)
+        if missing:
+            raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))} (expected {', '.join(COLUMNS)})")
+        load_chunk(chunk, store, report)
+    return _finish_report(report, started)
+
+
+# =========== iCalendar ===========
+def _unfolded_lines(lines):
+    """RFC 5545 line unfolding: continuation lines start with a space or tab."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _iter_events(lines):
+    """Yield each VEVENT as a dict of property name -> (parameters, value); only one event is held at a time.
+
+    Properties of components nested in the event (e.g. a VALARM's SUMMARY) are skipped.
+    """
+    event = None
+    depth = 0  # Components open inside the current event
+    for line in _unfolded_lines(lines):
+        if line == "BEGIN:VEVENT" and event is None:
+            event, depth = {}, 0
+        elif event is None:
+            continue
+        elif line.upper().startswith("BEGIN:"):
+            depth += 1
+        elif line.upper().startswith("END:"):
+            if depth:
+                depth -= 1
+            elif line == "END:VEVENT":
+                yield event
+                event = None
+        elif depth == 0 and ':' in line:
+            name, value = line.split(':', 1)
+            name, _, params = name.partition(';')
+            if name.upper() == "EXDATE" and "EXDATE" in event:
+                value = event["EXDATE"][1] + ',' + value
+            event[name.upper()] = (params, value)
+
+
+def _unescape(text):
+    return text.replace('\\n', ' ').replace('\\N', ' ').replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+
+
+def _ics_datetime(value, tz=None):
+    """Parse DATE-TIME values like 20251020T080000 or 20251020T080000Z.
+
+    Floating and TZID times are already wall-clock times and kept as they are; UTC times (Z) are
+    converted to `tz` (a tzinfo, by default the local time zone).
+    """
+    value = value.strip()
+    moment = datetime.strptime(value.rstrip('Z')[:15], "%Y%m%dT%H%M%S")
+    if value.endswith('Z'):
+        moment = _from_utc(moment, tz)
+    return moment
+
+
+def _from_utc(moment, tz):
+    return moment.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+
+def _week_offset(moment, this_monday):
+    return (moment.date() - this_monday).days // 7
+
+
+def _series_from_rrule(rrule, start, end, course, location, this_monday, exdates, tz=None):
+    """Turn a weekly/daily RRULE into a RecurrenceRule; None for rules we can't represent."""
+    parts = dict(part.split('=', 1) for part in rrule.split(';') if '=' in part)
+    freq = parts.get("FREQ", "").upper()
+    if freq == "DAILY" and parts.get("INTERVAL", "1") == "1":
+        days, interval = range(1, 8), 1
+    elif freq == "WEEKLY":
+        by_day = [day[-2:].upper() for day in parts.get("BYDAY", "").split(',') if day]
+        days = [RRULE_DAYS.index(day) + 1 for day in by_day if day in RRULE_DAYS] or [start.weekday() + 1]
+        interval = int(parts.get("INTERVAL", 1))
+    else:
+        return None
+    days = sorted(set(days))
+    start_day = start.weekday() + 1
+    if start_day not in days or interval < 1:
+        return None  # DTSTART would be an extra occurrence outside the pattern
+
+    first_week = _week_offset(start, this_monday)
+    exceptions = {(_week_offset(moment, this_monday), moment.weekday() + 1) for moment in exdates}
+    exceptions |= {(first_week, day) for day in days if day < start_day}  # Nothing before DTSTART
+    count = None
+    if "COUNT" in parts:
+        # The first week may be partial, so weeks are counted from the occurrences actually left
+        occurrences = int(parts["COUNT"])
+        first_days = [day for day in days if day >= start_day]
+        if occurrences < 1:
+            return None
+        if occurrences <= len(first_days):
+            count, last_days = 1, first_days[:occurrences]
+        else:
+            full_weeks, rest = divmod(occurrences - len(first_days), len(days))
+            count = 1 + full_weeks + (rest > 0)
+            last_days = days[:rest] if rest else days
+        last_week = first_week + (count - 1) * interval
+        exceptions |= {(last_week, day) for day in days if day not in last_days}
+    elif "UNTIL" in parts:
+        if 'T' in parts["UNTIL"]:
+            until = _ics_datetime(parts["UNTIL"], tz)
+            if until.time() < start.time():  # That day's occurrence would start after UNTIL
+                until -= timedelta(days=1)
+        else:
+            until = datetime.strptime(parts["UNTIL"][:8], "%Y%m%d")
+        weeks_until = _week_offset(until, this_monday) - first_week
+        if until.date() < start.date():
+            return None
+        count = weeks_until // interval + 1
+        if weeks_until % interval == 0:  # UNTIL falls in a week of the pattern: nothing after it
+            exceptions |= {(first_week + weeks_until, day) for day in days if day > until.weekday() + 1}
+    return RecurrenceRule(course, days, start.strftime("%H:%M"), end.strftime("%H:%M"), location, first_week, interval, count, exceptions)
+
+
+def _load_event_chunk(events, store, report, this_monday, tz=None):
+    """Vectorized: turn (summary, location, DTSTART, DTEND) strings into the course schema and load them."""
+    frame = pd.DataFrame(events, columns=["Course", "Location", "DTSTART", "DTEND"], dtype="string")
+    start = _ics_datetime_column(frame["DTSTART"], tz)
+    end = _ics_datetime_column(frame["DTEND"], tz).fillna(start + pd.Timedelta(hours=1))  # DTEND is optional
+    chunk = pd.DataFrame({
+        "Course": frame["Course"],
+        "Day": start.dt.weekday + 1,
+        "Start": start.dt.strftime("%H:%M"),
+        "End": end.dt.strftime("%H:%M"),
+        "Location": frame["Location"],
+        "Week Offset": (start.dt.normalize() - pd.Timestamp(this_monday)).dt.days // 7,
+    })
+    load_chunk(chunk, store, report)
+
+
+def _ics_datetime_column(values, tz=None):
+    """Vectorized _ics_datetime(); unparseable values become NaT."""
+    values = values.str.strip()
+    moments = pd.to_datetime(values.str.rstrip('Z').str[:15], format="%Y%m%dT%H%M%S", errors='coerce')
+    utc = (values.str.endswith('Z').fillna(False) & moments.notna()).to_numpy()
+    if utc.any():
+        moments[utc] = [_from_utc(moment, tz) for moment in moments[utc].dt.to_pydatetime()]
+    return moments
+
+
+def import_ics(source, store, chunk_size=CHUNK_SIZE, tz=None):
+    """Stream VEVENTs from an .ics file into the store.
+
+    Single events become rows (week offset relative to the current week); weekly/daily RRULEs become
+    recurring series with their EXDATEs as exceptions. UTC times are converted to `tz` (by default the
+    local time zone) before they are checked against the timetable's hours.
+    """
+    report = _new_report()
+    started = time.perf_counter()
+    this_monday = get_current_week_dates(0)[0].date()
+    lines = io.TextIOWrapper(source, encoding='utf-8') if isinstance(source, (io.BufferedIOBase, io.RawIOBase)) else source
+
+    events = []
+    for event in _iter_events(lines):
+        course = _unescape(event.get("SUMMARY", ("", ""))[1])
+        location = _unescape(event.get("LOCATION", ("", ""))[1])
+        if "RRULE" in event:
+            _import_recurring_event(event, course, location, store, report, this_monday, tz)
+            continue
+
+        events.append((course, location, event.get("DTSTART", ("", ""))[1], event.get("DTEND", ("", ""))[1]))
+        if len(events) >= chunk_size:
+            _load_event_chunk(events, store, report, this_monday, tz)
+            events = []
+    if events:
+        _load_event_chunk(events, store, report, this_monday, tz)
+    return _finish_report(report, started)
+
+
+def _import_recurring_event(event, course, location, store, report, this_monday, tz=None):
+    report['rows_read'] += 1
+    reason = None
+    try:
+        start = _ics_datetime(event["DTSTART"][1], tz)
+        end = _ics_datetime(event["DTEND"][1], tz) if "DTEND" in event else start + timedelta(hours=1)
+    except (KeyError, ValueError):
+        reason = "invalid DTSTART/DTEND"
+    else:
+        exdates = []
+        for value in event.get("EXDATE", ("", ""))[1].split(','):
+            try:
+                exdates.append(_ics_datetime(value, tz))
+            except ValueError:
+                pass
+        try:
+            rule = _series_from_rrule(event["RRULE"][1], start, end, course, location, this_monday, exdates, tz)
+        except ValueError:  # e.g. COUNT=x or a malformed UNTIL
+            rule = None
+        if rule is None:
+            reason = "unsupported RRULE (only weekly and daily rules starting on one of their days are imported)"
+        elif not (rule.course and DAY_START <= rule.start < rule.end <= DAY_END):
+            reason = f"recurring event outside {TIME_SLOTS[0]}-{TIME_SLOTS[-1]}"
+
+    if reason is None:
+        store.add_series(rule)
+        report['rows_imported'] += 1
+        report['series_imported'] += 1
+    else:
+        report['rows_rejected'] += 1
+        if len(report['rejected']) < MAX_REJECTED_SAMPLES:
+            report['rejected'].append((report['rows_read'], reason))
+
+
+def import_file(source, name, store, chunk_size=CHUNK_SIZE, tz=None):
+    """Import a .csv or .ics file (path or file object) by its file name; `tz` is for .ics UTC times."""
+    if name.lower().endswith(('.ics', '.ical')):
+        if isinstance(source, str):
+            with open(source, encoding='utf-8') as f:
+                return import_ics(f, store, chunk_size, tz)
+        return import_ics(source, store, chunk_size, tz)
+    return import_csv(source, store, chunk_size)
@@ -1,32 +1,71 @@
 
 import streamlit as st
-import pandas as pd
-from gen_file import generate_timetable_image
-import io
+from encoding import PNG_COMPRESS_LEVEL, PALETTE_COLORS, available_formats, encode_images
+from course_store import CourseStore, MAX_WEEK_OFFSET, RecurrenceRule, SERIES_COLUMN, format_minutes
+from gen_file import DAYS, generate_timetable_image, get_week_date_range, find_clashes, TimetableRenderer
+from importer import import_file
+from profiling import NO_PROFILE, RenderProfile
+from vector_render import can_render_pdf
+import functools
+import hashlib
+import json
 from datetime import time, timedelta, datetime
+from zoneinfo import ZoneInfo
 
 # --- App Configuration ---
 st.set_page_config(page_title="Timetable Generator", layout="wide")
 
-if 'courses_df' not in st.session_state:
-    from gen_file import sample_courses
-    st.session_state.courses_df = pd.DataFrame(sample_courses, columns=["Course", "Day", "Start", "End", "Location", "Week Offset"])
+PREVIEW_SCALE = 0.75  # The browser shrinks the preview anyway, so render it smaller
+EXPORT_SCALES = {"Standard (1x)": 1.0, "Print (2x)": 2.0}
+IMPORT_TIMEZONE = None  # Zone that UTC times in imported .ics files are converted to, e.g. "Asia/Shanghai"; None = the server's
+PNG_PALETTE_DEFAULT = False  # Set to True to quantize PNG downloads unless the user opts out
 
-# Ensure 'Week Offset' column exists for backward compatibility or new sessions
-if 'Week Offset' not in st.session_state.courses_df.columns:
-    st.session_state.courses_df['Week Offset'] = 0
+if 'course_store' not in st.session_state:
+    from gen_file import sample_courses
+    st.session_state.course_store = CourseStore(sample_courses) # Indexed by week, start/end pre-parsed to minutes
 
 if 'current_week_offset' not in st.session_state:
     st.session_state.current_week_offset = 0 # 0 for current week, 1 for next week, -1 for previous week
 
+if 'imported_files' not in st.session_state:
+    st.session_state.imported_files = set() # Uploads already imported, so reruns don't import them again
+
+if 'renderer' not in st.session_state:
+    st.session_state.renderer = TimetableRenderer() # Keeps the last preview so edits only redraw changed days
+
 # --- Helper Functions ---
-def get_current_week_dates(week_offset):
-    today = datetime.today()
-    # Find the most recent Monday (or today if today is Monday)
-    start_of_week = today - timedelta(days=today.weekday())
-    current_monday = start_of_week + timedelta(weeks=week_offset)
-    current_sunday = current_monday + timedelta(days=6)
-    return current_monday, current_sunday
+def timetable_key(courses, selected_style, week_date_range, course_colors):
+    # Content hash of everything the rendered image depends on
+    return hashlib.sha256(repr((courses, selected_style, week_date_range, sorted(course_colors.items()))).encode()).hexdigest()
+
+# The leading underscore tells Streamlit not to hash those arguments; `key` already identifies them
+@st.cache_data(max_entries=32, show_spinner=False)
+def encode_vector(key, _courses, selected_style, week_date_range, image_format, _course_colors):
+    backend = 'svg' if image_format == "SVG" else 'pdf'
+    return generate_timetable_image(courses=_courses, selected_style=selected_style, week_date_range=week_date_range, course_colors=_course_colors, backend=backend)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def encode_raster(key, _courses, selected_style, week_date_range, scale, formats, _course_colors, encode_options):
+    # Only the encoded bytes are cached; the full-resolution image is dropped once they are made
+    img = generate_timetable_image(courses=_courses, selected_style=selected_style, week_date_range=week_date_range, scale=scale, course_colors=_course_colors)
+    return encode_images(img, formats, scale, **dict(encode_options))
+
+def encode_timetable(key, _courses, selected_style, week_date_range, scale, image_format, _course_colors, encode_options):
+    # Only called when a download is requested, so the full-resolution render happens here too
+    vector_pdf = can_render_pdf(_courses, week_date_range)
+    if image_format == "SVG" or (image_format == "PDF" and vector_pdf):
+        return encode_vector(key, _courses, selected_style, week_date_range, image_format, _course_colors)
+    # A raster PDF comes from the same render as the PNG, so when one is needed both are encoded together
+    formats = ("PNG", "PDF") if image_format in ("PNG", "PDF") and not vector_pdf else (image_format,)
+    encoded, _ = encode_raster(key, _courses, selected_style, week_date_range, scale, formats, _course_colors, encode_options)
+    return encoded[image_format]
+
+def profile_export(courses, selected_style, week_date_range, scale, course_colors, encode_options):
+    # Uncached on purpose: renders and encodes the raster downloads from scratch to see where the time goes
+    profile = RenderProfile()
+    img = generate_timetable_image(courses=courses, selected_style=selected_style, week_date_range=week_date_range, scale=scale, course_colors=course_colors, profile=profile)
+    _, encode_report = encode_images(img, ("PNG", "PDF"), scale, profile, **dict(encode_options))
+    return profile, encode_report
 
 # --- Sidebar ---
 with st.sidebar:
@@ -53,6 +92,7 @@ with st.sidebar:
 
         location = st.text_input("Location (Optional)")
         recursion_type = st.selectbox("Recursion", ["None", "Daily", "Weekly"], index=0)
+        repeat_weeks = st.number_input("Weekly: repeat for (weeks, 0 = no end)", min_value=0, value=8)
         
         if submitted:
             if course_name and day and start_time_obj and duration_hours:
@@ -61,54 +101,95 @@ with st.sidebar:
                 end_time_str = end_datetime.strftime("%H:%M")
                 start_time_str = start_time_obj.strftime("%H:%M")
 
-                courses_to_add = []
-
                 if recursion_type == "None":
-                    courses_to_add.append([course_name, day, start_time_str, end_time_str, location, st.session_state.current_week_offset])
-                elif recursion_type == "Daily":
-                    for i in range(7): # Add for 7 days
-                        # Day 1 is the selected day, then day+1, day+2, etc.
-                        # Need to handle wrapping around to the next week (day 7 -> day 1 of next week)
-                        # Streamlit's day is 1-7, so (day + i - 1) % 7 + 1
-                        daily_day = (day + i - 1) % 7 + 1
-                        courses_to_add.append([course_name, daily_day, start_time_str, end_time_str, location, st.session_state.current_week_offset])
-                elif recursion_type == "Weekly":
-                    for i in range(8): # Add for 8 weeks (0 to 7)
-                        courses_to_add.append([course_name, day, start_time_str, end_time_str, location, st.session_state.current_week_offset + i])
-                
-                if courses_to_add:
-                    new_courses_df = pd.DataFrame(courses_to_add, columns=["Course", "Day", "Start", "End", "Location", "Week Offset"])
-                    st.session_state.courses_df = pd.concat([st.session_state.courses_df, new_courses_df], ignore_index=True)
-                    st.success(f"{len(courses_to_add)} Course(s) added successfully!")
+                    st.session_state.course_store.add(course_name, day, start_time_str, end_time_str, location, st.session_state.current_week_offset)
+                    st.success("1 Course(s) added successfully!")
+                else:
+                    # Recurring courses are stored as one rule and expanded only for the week being shown
+                    if recursion_type == "Daily": # Every day of the current week
+                        rule = RecurrenceRule(course_name, range(1, 8), start_time_str, end_time_str, location, st.session_state.current_week_offset, count=1)
+                    else: # Same day every week
+                        rule = RecurrenceRule(course_name, [day], start_time_str, end_time_str, location, st.session_state.current_week_offset, count=repeat_weeks or None)
+                    st.session_state.course_store.add_series(rule)
+                    st.success(f"Recurring course added ({rule.to_rrule()})")
             else:
                 st.error("Please fill in all required fields.")
     
+    st.header("Import Courses")
+    uploaded_file = st.file_uploader("CSV (Course, Day, Start, End, Location, Week Offset) or iCalendar (.ics)", type=["csv", "ics"])
+    if uploaded_file is not None and uploaded_file.file_id not in st.session_state.imported_files:
+        st.session_state.imported_files.add(uploaded_file.file_id)
+        try:
+            report = import_file(uploaded_file, uploaded_file.name, st.session_state.course_store, tz=IMPORT_TIMEZONE and ZoneInfo(IMPORT_TIMEZONE))
+        except ValueError as e:
+            st.error(f"Import failed: {e}")
+        else:
+            st.success(f"Imported {report['rows_imported']} of {report['rows_read']} rows ({report['rows_per_second']:,.0f} rows/s)")
+            if report['rejected']:
+                st.warning(f"{report['rows_rejected']} rows skipped, e.g. " + "; ".join(f"row {row}: {reason}" for row, reason in report['rejected'][:5]))
+
     st.header("Timetable Controls")
     selected_style = st.selectbox("Choose a style", ["modern", "cute", "cool", "fresh"])
+    export_scale = EXPORT_SCALES[st.selectbox("Download resolution", list(EXPORT_SCALES))]
+    with st.expander("Download Encoding"):
+        palette_colors = PALETTE_COLORS if st.checkbox("Reduce PNG colors", value=PNG_PALETTE_DEFAULT, help="Adaptive color palette: PNGs less than half the size that look the same") else None
+        compress_level = st.slider("PNG compression", 1, 9, PNG_COMPRESS_LEVEL, help="Higher is smaller but slower")
+    encode_options = (("palette_colors", palette_colors), ("compress_level", compress_level)) # Hashable, it is part of the cache key
+    profiling_enabled = st.checkbox("Profile rendering", help="Time each render stage of the preview and of a full PNG/PDF export")
 
 # --- Main Section ---
 st.title("Timetable Preview")
 
-# Initialize buffers for download buttons
-png_buffer = io.BytesIO()
-pdf_buffer = io.BytesIO()
+# Filter courses for the current week offset
+courses_list = st.session_state.course_store.week_courses(st.session_state.current_week_offset)
+
+# Render the preview; after an edit only the changed day columns are redrawn
+week_date_range = get_week_date_range(st.session_state.current_week_offset)
+preview_profile = RenderProfile() if profiling_enabled else NO_PROFILE
+final_img = st.session_state.renderer.render(courses_list, selected_style, week_date_range, PREVIEW_SCALE, preview_profile)
+# Downloads use the preview's colors and are served from memory if this exact state was exported before
+course_colors = dict(st.session_state.renderer.course_colors)
+render_key = timetable_key(courses_list, selected_style, week_date_range, course_colors)
 
 # Header and download buttons in one row
-download_col1, download_col2 = st.columns(2)
+# PNG/PDF/SVG bytes are produced only when a button is clicked, not on every rerun
+webp_available = "WEBP" in available_formats()
+download_col1, download_col2, download_col3, download_col4 = st.columns(4)
 with download_col1:
     st.download_button(
         label="Download PNG",
-        data=png_buffer,
+        data=functools.partial(encode_timetable, render_key, courses_list, selected_style, week_date_range, export_scale, "PNG", course_colors, encode_options),
         file_name=f"timetable_{selected_style}.png",
         mime="image/png",
+        on_click="ignore",
         use_container_width=True
     )
 with download_col2:
     st.download_button(
         label="Download PDF",
-        data=pdf_buffer,
+        data=functools.partial(encode_timetable, render_key, courses_list, selected_style, week_date_range, export_scale, "PDF", course_colors, encode_options),
         file_name=f"timetable_{selected_style}.pdf",
         mime="application/octet-stream",
+        on_click="ignore",
+        use_container_width=True
+    )
+with download_col3:
+    st.download_button(
+        label="Download SVG",
+        data=functools.partial(encode_timetable, render_key, courses_list, selected_style, week_date_range, export_scale, "SVG", course_colors, encode_options),
+        file_name=f"timetable_{selected_style}.svg",
+        mime="image/svg+xml",
+        on_click="ignore",
+        use_container_width=True
+    )
+with download_col4:
+    st.download_button(
+        label="Download WebP",
+        data=functools.partial(encode_timetable, render_key, courses_list, selected_style, week_date_range, export_scale, "WEBP", course_colors, encode_options),
+        file_name=f"timetable_{selected_style}.webp",
+        mime="image/webp",
+        on_click="ignore",
+        disabled=not webp_available,
         use_container_width=True
     )
 
@@ -116,66 +197,70 @@ with download_col2:
 week_nav_cols = st.columns([1, 3, 1])
 with week_nav_cols[0]:
     if st.button("Previous Week", use_container_width=True):
-        if st.session_state.current_week_offset > 0:
+        if st.session_state.current_week_offset > -MAX_WEEK_OFFSET:  # Imported events can lie in past weeks
             st.session_state.current_week_offset -= 1
             st.rerun()
 with week_nav_cols[1]:
-    current_monday, current_sunday = get_current_week_dates(st.session_state.current_week_offset)
-    st.markdown(f"<h3 style='text-align: center;'>Week: {current_monday.strftime('%m-%d')} to {current_sunday.strftime('%m-%d')}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='text-align: center;'>Week: {week_date_range}</h3>", unsafe_allow_html=True)
 with week_nav_cols[2]:
     if st.button("Next Week", use_container_width=True):
-        if st.session_state.current_week_offset < 7: # 0 to 7 makes 8 weeks
+        # Recurring courses are expanded lazily, so there is no fixed window of weeks
+        if st.session_state.current_week_offset < MAX_WEEK_OFFSET:
             st.session_state.current_week_offset += 1
             st.rerun()
 
 # Display and edit current courses
-# Filter courses for the current week offset
-current_week_courses_df = st.session_state.courses_df[st.session_state.courses_df['Week Offset'] == st.session_state.current_week_offset]
-
-
-# Generate and display the timetable
-if not current_week_courses_df.empty:
-    courses_list = [tuple(row) for row in current_week_courses_df.to_numpy()]
-    
-    current_monday, current_sunday = get_current_week_dates(st.session_state.current_week_offset)
-    final_img = generate_timetable_image(courses=courses_list, selected_style=selected_style, week_date_range=f"{current_monday.strftime('%m-%d')} to {current_sunday.strftime('%m-%d')}")
-
-    # In-memory files for download
-    png_buffer.seek(0) # Reset buffer position
-    png_buffer.truncate(0) # Clear previous content
-    final_img.save(png_buffer, format="PNG")
-    png_buffer.seek(0)
-
-    pdf_buffer.seek(0) # Reset buffer position
-    pdf_buffer.truncate(0) # Clear previous content
-    final_img.save(pdf_buffer, format="PDF")
-    pdf_buffer.seek(0)
-
-    st.image(final_img)
+st.image(final_img)
+# Clashing courses are drawn side by side; list them so the overlap isn't missed
+for clash in find_clashes(courses_list):
+    st.warning(f"Clash on {DAYS[clash[0][1] - 1]}: " + ", ".join(
+        f"{name} ({format_minutes(start)}-{format_minutes(end)})" for name, _, start, end, *_ in clash))
+if st.session_state.course_store.has_courses(st.session_state.current_week_offset):
     with st.expander("Edit Courses Data"):
         st.header("Current Courses Data")
-        edited_df = st.data_editor(current_week_courses_df, use_container_width=True, num_rows="dynamic")
+        st.caption("Rows with a Series id belong to a recurring course: editing one detaches it from the series, deleting one skips that week.")
+        current_week_courses_df = st.session_state.course_store.week_frame(st.session_state.current_week_offset)
+        edited_df = st.data_editor(current_week_courses_df, use_container_width=True, num_rows="dynamic", disabled=[SERIES_COLUMN])
 
         if not edited_df.equals(current_week_courses_df):
-            st.session_state.courses_df = pd.concat([
-                st.session_state.courses_df[st.session_state.courses_df['Week Offset'] != st.session_state.current_week_offset],
-                edited_df
-            ], ignore_index=True)
-            st.rerun()
+            # Only this week's rows are rewritten; rows whose Week Offset was edited move to that week
+            try:
+                st.session_state.course_store.replace_week(st.session_state.current_week_offset, edited_df.itertuples(index=False))
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.rerun()
 else:
-    current_monday, current_sunday = get_current_week_dates(st.session_state.current_week_offset)
-    empty_img = generate_timetable_image(courses=[], selected_style=selected_style, week_date_range=f"{current_monday.strftime('%m-%d')} to {current_sunday.strftime('%m-%d')}")
+    st.warning("No courses to display for this week. Please add a course using the sidebar.")
 
-    # In-memory files for download (for empty timetable)
-    png_buffer.seek(0) # Reset buffer position
-    png_buffer.truncate(0) # Clear previous content
-    empty_img.save(png_buffer, format="PNG")
-    png_buffer.seek(0)
+if st.session_state.course_store.series():
+    with st.expander("Edit Recurring Courses"):
+        st.caption("Changes here apply to every week of the series. Days are comma-separated (1 = Monday); empty Weeks means no end.")
+        series_df = st.session_state.course_store.series_frame()
+        edited_series_df = st.data_editor(series_df, use_container_width=True, num_rows="dynamic", disabled=[SERIES_COLUMN])
 
-    pdf_buffer.seek(0) # Reset buffer position
-    pdf_buffer.truncate(0) # Clear previous content
-    empty_img.save(pdf_buffer, format="PDF")
-    pdf_buffer.seek(0)
+        if not edited_series_df.equals(series_df):
+            st.session_state.course_store.replace_series(edited_series_df.itertuples(index=False))
+            st.rerun()
 
-    st.image(empty_img)
-    st.warning("No courses to display for this week. Please add a course using the sidebar.")
+# Render profile, shown last so it covers this run's preview render
+if profiling_enabled:
+    export_profile, encode_report = profile_export(courses_list, selected_style, week_date_range, export_scale, course_colors, encode_options)
+    render_report = {
+        "preview": preview_profile.report(), # Empty stages if nothing changed since the last preview
+        "export": export_profile.report(),
+    }
+    with st.sidebar.expander("Render Profile", expanded=True):
+        for name, report in render_report.items():
+            st.caption(f"{name.capitalize()}: {report['total_seconds'] * 1000:.1f} ms")
+            st.dataframe(
+                [{**stage, "seconds": round(stage["seconds"] * 1000, 2)} for stage in report["stages"]],
+                column_config={"seconds": "ms"}, hide_index=True, use_container_width=True
+            )
+        st.caption("Encoded downloads")
+        st.dataframe(
+            [{"format": image_format, "KB": round(result["bytes"] / 1024, 1), "ms": round(result["seconds"] * 1000, 2)} for image_format, result in encode_report.items()],
+            hide_index=True, use_container_width=True
+        )
+        render_report["export"]["encode"] = encode_report
+        st.download_button("Download profile (JSON)", data=json.dumps(render_report, indent=2), file_name="render_profile.json", mime="application/json")
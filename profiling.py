@@ -0,0 +1,63 @@
+"""Optional per-stage profiling of timetable renders.
+
+Pass a RenderProfile to generate_timetable_image (or TimetableRenderer.render) and wrap any other work,
+e.g. encoding, in `profile.stage(name)`. Each stage records wall time, the net change in allocated
+Python memory blocks and the number of textbbox calls (text measurements that missed the cache).
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_counters = threading.local()  # Per thread, so concurrent renders don't count each other's calls
+
+
+def count_textbbox():
+    _counters.textbbox = getattr(_counters, 'textbbox', 0) + 1
+
+
+def textbbox_calls():
+    return getattr(_counters, 'textbbox', 0)
+
+
+class RenderProfile:
+    """Accumulates timings per stage; a stage entered several times (e.g. once per course) is summed."""
+
+    def __init__(self):
+        self.stages = {}  # Stage name -> totals, in the order stages were first entered
+
+    @contextmanager
+    def stage(self, name):
+        blocks, bbox_calls, start = sys.getallocatedblocks(), textbbox_calls(), time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            totals = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'allocated_blocks': 0, 'textbbox_calls': 0})
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+            totals['allocated_blocks'] += sys.getallocatedblocks() - blocks
+            totals['textbbox_calls'] += textbbox_calls() - bbox_calls
+
+    def report(self):
+        """The stages as a JSON-serializable dict."""
+        return {
+            'total_seconds': sum(totals['seconds'] for totals in self.stages.values()),
+            'stages': [{'stage': name, **totals} for name, totals in self.stages.items()],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+
+class _NoProfile:
+    """Stands in when profiling is off, so render code can always write `with profile.stage(...)`."""
+
+    _stage = nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+
+NO_PROFILE = _NoProfile()
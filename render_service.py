@@ -0,0 +1,266 @@
+"""Local HTTP render service: course JSON in, PNG / PDF / SVG (or WebP / AVIF) out.
+
+    python render_service.py --port 8502 --workers 4
+
+POST /render with a JSON body such as
+
+    {"courses": [["Linear Algebra", 3, "8:00", "9:40", "Classroom A-101"], ...],
+     "style": "fresh", "week_date_range": "09-01 to 09-07", "scale": 1, "format": "png"}
+
+Courses may also be objects with course/day/start/end/location keys; `course_colors` optionally pins
+names to colors. Renders run in a bounded process pool. Identical requests that arrive while one is
+rendering wait for that render instead of starting their own, and finished results are served from a
+shared LRU cache, so a whole class cohort with the same timetable costs one render.
+GET /health returns the cache and pool counters.
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from course_store import MISSING, parse_minutes
+from encoding import MIME_TYPES, PNG_COMPRESS_LEVEL, PALETTE_COLORS, available_formats, encode_image
+from gen_file import DAY_END, DAY_START, STYLES, TIME_SLOTS, generate_timetable_image
+
+DEFAULT_PORT = 8502
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # Finished renders kept in memory
+MAX_PENDING = 64  # Distinct renders queued or running before new ones are turned away with 503
+MAX_BODY_BYTES = 1024 * 1024
+MAX_COURSES = 1000
+SCALE_RANGE = (0.25, 4.0)
+RENDER_TIMEOUT = 120  # Seconds a request waits for its render
+MIN_DURATION = 10  # Minutes; shorter blocks would have no height left after their margins
+CONTENT_TYPES = {'svg': 'image/svg+xml', **{image_format.lower(): MIME_TYPES[image_format] for image_format in available_formats()}}
+
+
+class RequestError(ValueError):
+    """A render request that can't be served as sent (answered with 400)."""
+
+
+class Overloaded(RuntimeError):
+    """Too many distinct renders pending (answered with 503)."""
+
+
+def parse_job(payload):
+    """Validate a request body into a hashable job: (courses, style, week_date_range, scale, format, course_colors)."""
+    if not isinstance(payload, dict):
+        raise RequestError("Body must be a JSON object")
+    selected_style = payload.get('style', 'fresh')
+    if selected_style not in STYLES:
+        raise RequestError(f"Unknown style {selected_style!r}, expected one of {', '.join(STYLES)}")
+    output_format = str(payload.get('format', 'png')).lower()
+    if output_format not in CONTENT_TYPES:
+        raise RequestError(f"Unknown format {output_format!r}, expected one of {', '.join(CONTENT_TYPES)}")
+    try:
+        scale = float(payload.get('scale', 1.0))
+    except (TypeError, ValueError):
+        raise RequestError("scale must be a number")
+    if not SCALE_RANGE[0] <= scale <= SCALE_RANGE[1]:
+        raise RequestError(f"scale must be between {SCALE_RANGE[0]} and {SCALE_RANGE[1]}")
+    week_date_range = payload.get('week_date_range', "")
+    course_colors = payload.get('course_colors') or {}
+    if not isinstance(week_date_range, str) or not isinstance(course_colors, dict):
+        raise RequestError("week_date_range must be a string and course_colors an object")
+    for name, color in course_colors.items():
+        # Hex only, like the style palettes: the vector backends don't understand color names
+        if not isinstance(color, str) or not re.fullmatch(r'#[0-9A-Fa-f]{6}', color):
+            raise RequestError(f"course_colors[{name!r}]: {color!r} is not a color like '#A8DADC'")
+
+    raw_courses = payload.get('courses')
+    if not isinstance(raw_courses, list):
+        raise RequestError("courses must be a list")
+    if len(raw_courses) > MAX_COURSES:
+        raise RequestError(f"At most {MAX_COURSES} courses per request")
+    courses = tuple(_parse_course(index, course_data) for index, course_data in enumerate(raw_courses))
+    return courses, selected_style, week_date_range, scale, output_format, tuple(sorted(course_colors.items()))
+
+
+def _parse_course(index, course_data):
+    if isinstance(course_data, dict):
+        course_data = [course_data.get(key) for key in ('course', 'day', 'start', 'end', 'location')]
+    if not isinstance(course_data, (list, tuple)) or not 4 <= len(course_data) <= 6:
+        raise RequestError(f"courses[{index}]: expected [course, day, start, end, location]")
+    course, day, start, end, location = (list(course_data) + [""])[:5]
+    start, end = parse_minutes(start), parse_minutes(end)
+    if not isinstance(course, str) or not course:
+        raise RequestError(f"courses[{index}]: missing course name")
+    day = _parse_day(day)
+    if day is None:
+        raise RequestError(f"courses[{index}]: day must be a whole number 1-7")
+    if MISSING in (start, end) or not DAY_START <= start < end <= DAY_END:
+        raise RequestError(f"courses[{index}]: start and end must be H:MM times within {TIME_SLOTS[0]}-{TIME_SLOTS[-1]}, start before end")
+    if end - start < MIN_DURATION:
+        raise RequestError(f"courses[{index}]: courses must last at least {MIN_DURATION} minutes")
+    return course, day, start, end, location if isinstance(location, str) else "", 0
+
+
+def _parse_day(day):
+    """1-7 as an int or digit string; None for anything else, including booleans and 3.7."""
+    if isinstance(day, str) and day.strip().isdigit():
+        day = int(day)
+    elif isinstance(day, float) and day.is_integer():
+        day = int(day)
+    if type(day) is not int or not 1 <= day <= 7:
+        return None
+    return day
+
+
+def job_key(job):
+    return hashlib.sha256(repr(job).encode()).hexdigest()
+
+
+def render_job(job, encode_options=()):
+    """Worker: render one job to bytes, encoding raster output with encode_image() `encode_options`."""
+    courses, selected_style, week_date_range, scale, output_format, course_colors = job
+    options = dict(courses=list(courses), selected_style=selected_style, week_date_range=week_date_range,
+                   scale=scale, course_colors=dict(course_colors))
+    if output_format == 'svg':
+        return generate_timetable_image(backend='svg', **options).encode('utf-8')
+    if output_format == 'pdf':
+        from vector_render import can_render_pdf
+        if can_render_pdf(courses, week_date_range):
+            return generate_timetable_image(backend='pdf', **options)
+
+    img = generate_timetable_image(**options)
+    return encode_image(img, output_format, scale, **dict(encode_options))
+
+
+class RenderService:
+    """Process pool plus in-flight request coalescing and a byte-bounded LRU result cache."""
+
+    def __init__(self, workers=None, cache_max_bytes=CACHE_MAX_BYTES, max_pending=MAX_PENDING, encode_options=()):
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._encode_options = tuple(encode_options)  # Same for every request, so not part of the cache key
+        self._lock = threading.RLock()  # Re-entrant: a render's done-callback may run on the submitting thread
+        self._cache = OrderedDict()  # Job key -> bytes, least recently used first
+        self._cache_bytes = 0
+        self._cache_max_bytes = cache_max_bytes
+        self._in_flight = {}  # Job key -> Future of the render
+        self._max_pending = max_pending
+        self.counters = {'hits': 0, 'coalesced': 0, 'renders': 0, 'failures': 0, 'rejected': 0}
+
+    def render(self, job, timeout=RENDER_TIMEOUT):
+        """Return (bytes, how) where how is 'hit', 'coalesced' or 'rendered'."""
+        key = job_key(job)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.counters['hits'] += 1
+                return data, 'hit'
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                how = 'coalesced'
+            else:
+                if len(self._in_flight) >= self._max_pending:
+                    self.counters['rejected'] += 1
+                    raise Overloaded("Too many renders pending, try again shortly")
+                future = self._pool.submit(render_job, job, self._encode_options)
+                self._in_flight[key] = future
+                self.counters['renders'] += 1
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+                how = 'rendered'
+        return future.result(timeout), how
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                self.counters['failures'] += 1
+                return
+            data = future.result()
+            if len(data) > self._cache_max_bytes:
+                return
+            self._cache[key] = data
+            self._cache_bytes += len(data)
+            while self._cache_bytes > self._cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'cached': len(self._cache), 'cache_bytes': self._cache_bytes, 'in_flight': len(self._in_flight)}
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TimetableRender/1.0"
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._send_json(404, {'error': "Not found"})
+        self._send_json(200, {'status': 'ok', **self.server.service.stats()})
+
+    def do_POST(self):
+        if self.path != '/render':
+            return self._send_json(404, {'error': "Not found"})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                return self._send_json(400, {'error': "Invalid Content-Length"})
+            if length > MAX_BODY_BYTES:
+                return self._send_json(413, {'error': f"Body larger than {MAX_BODY_BYTES} bytes"})
+            job = parse_job(json.loads(self.rfile.read(length) or b'null'))
+        except ValueError as e:  # RequestError, a bad Content-Length or json.JSONDecodeError
+            return self._send_json(400, {'error': str(e)})
+        try:
+            data, how = self.server.service.render(job)
+        except Overloaded as e:
+            return self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        except Exception as e:
+            self.log_error("Render failed: %r", e)
+            return self._send_json(500, {'error': "Render failed"})
+        self._send(200, data, CONTENT_TYPES[job[4]], {'X-Render-Cache': how})
+
+    def _send_json(self, status, body, headers=None):
+        self._send(status, json.dumps(body).encode(), 'application/json', headers)
+
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, workers=None, cache_max_bytes=CACHE_MAX_BYTES, encode_options=()):
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.service = RenderService(workers, cache_max_bytes, encode_options=encode_options)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve timetable renders over HTTP (POST /render, GET /health).")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, help="Render processes (default: one per CPU)")
+    parser.add_argument('--cache-mb', type=int, default=CACHE_MAX_BYTES // (1024 * 1024), help="Result cache size in MB")
+    parser.add_argument('--png-palette', action='store_true', help=f"Quantize PNGs to a {PALETTE_COLORS}-color palette (smaller files)")
+    parser.add_argument('--png-compress-level', type=int, choices=range(1, 10), default=PNG_COMPRESS_LEVEL,
+                        metavar='1-9', help=f"PNG zlib level (default: {PNG_COMPRESS_LEVEL})")
+    args = parser.parse_args(argv)
+
+    encode_options = (('palette_colors', PALETTE_COLORS if args.png_palette else None), ('compress_level', args.png_compress_level))
+    server = make_server(args.host, args.port, args.workers, args.cache_mb * 1024 * 1024, encode_options)
+    print(f"Serving timetable renders on http://{args.host}:{args.port}/render")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import pytest
+
+from course_store import MAX_WEEK_OFFSET, MISSING, CourseStore
+
+
+def test_week_courses_skip_incomplete_rows():
+    store = CourseStore([("Math", 1, "8:00", "9:40", "A1", 0), ("", 2, "8:00", "9:40", "", 0), ("Half", None, "", "", "", 0)])
+    assert store.week_courses(0) == [("Math", 1, 480, 580, "A1", 0)]
+    assert len(store) == 3
+    assert store.row(2)[1:4] == (MISSING, MISSING, MISSING)
+
+
+def test_replace_week_moves_edited_rows_and_keeps_other_weeks():
+    store = CourseStore([("Math", 1, "8:00", "9:40", "", 0), ("Phys", 2, "10:00", "11:40", "", 0), ("Chem", 3, "8:00", "9:40", "", 1)])
+    store.replace_week(0, [("Math", 1, "8:00", "9:40", "", 0), ("Phys", 2, "10:00", "11:40", "", 3)])
+    assert [course[0] for course in store.week_courses(0)] == ["Math"]
+    assert [course[0] for course in store.week_courses(3)] == ["Phys"]
+    assert [course[0] for course in store.week_courses(1)] == ["Chem"]
+    assert store.weeks() == [0, 1, 3]
+
+
+def test_compaction_keeps_live_rows_and_week_index():
+    store = CourseStore([(f"Course {i}", i % 7 + 1, "8:00", "9:40", "", i % 3) for i in range(30)])
+    for week_offset in (0, 1):
+        while store.week_row_ids(week_offset):  # Row ids change when the store compacts
+            store.remove(store.week_row_ids(week_offset)[0])
+    assert len(store) == 10
+    assert len(store._alive) < 20  # Compacted once tombstones passed half the table
+    assert store.weeks() == [2]
+    assert [course[0] for course in store.week_courses(2)] == [f"Course {i}" for i in range(2, 30, 3)]
+
+
+def test_replace_week_rejects_out_of_range_week_without_changing_anything():
+    store = CourseStore([("Math", 1, "8:00", "9:40", "", 0)])
+    with pytest.raises(ValueError):
+        store.replace_week(0, [("Math", 1, "8:00", "9:40", "", MAX_WEEK_OFFSET + 1)])
+    assert store.week_courses(0) == [("Math", 1, 480, 580, "", 0)]
+
+
+def test_extend_columns_validates_before_appending():
+    store = CourseStore([("Math", 1, "8:00", "9:40", "", 0)])
+    with pytest.raises(ValueError):
+        store.extend_columns(["A", "B"], [1, 2], [480, 480], [580, 580], ["", ""], [0, 2 ** 40])
+    with pytest.raises(ValueError):
+        store.extend_columns(["A"], [8], [480], [580], [""], [0])
+    with pytest.raises(ValueError):
+        store.add("A", 1, "8:00", "9:40", "", MAX_WEEK_OFFSET + 1)
+    assert len(store) == 1 and store.weeks() == [0]
+    assert store.week_courses(0) == [("Math", 1, 480, 580, "", 0)]
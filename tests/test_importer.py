@@ -0,0 +1,123 @@
+import io
+from datetime import timedelta, timezone
+
+import pytest
+
+from course_store import MAX_WEEK_OFFSET, CourseStore
+from importer import get_current_week_dates, import_csv, import_ics
+
+THIS_MONDAY = get_current_week_dates(0)[0].date()
+
+
+def ics(*events):
+    """An .ics file with one VEVENT per dict of properties."""
+    lines = ["BEGIN:VCALENDAR"]
+    for event in events:
+        lines += ["BEGIN:VEVENT", *(f"{key}:{value}" for key, value in event.items()), "END:VEVENT"]
+    return io.StringIO("\r\n".join(lines + ["END:VCALENDAR"]) + "\r\n")
+
+
+def stamp(week, day, time, utc=False):
+    """DATE-TIME of `day` (1 = Monday) in week `week` from now, e.g. 20251020T080000."""
+    date = THIS_MONDAY + timedelta(weeks=week, days=day - 1)
+    hours, minutes = time.split(':')
+    return f"{date:%Y%m%d}T{int(hours):02d}{minutes}00" + ("Z" if utc else "")
+
+
+def occurrences(store, weeks=range(-1, 30)):
+    return [course for week in weeks for course in store.week_courses(week)]
+
+
+def test_csv_rejects_bad_rows_with_reasons():
+    source = io.StringIO(
+        "Course,Day,Start,End,Location,Week Offset\n"
+        "Math,Mon,8:00,9:40,A1,0\n"
+        ",1,8:00,9:40,,0\n"
+        "Phys,9,8:00,9:40,,0\n"
+        "Chem,2,9:40,8:00,,0\n"
+        "Bio,2,7:00,8:00,,0\n"
+        "Art,3,8:00,9:40,,1.5\n"
+        f"Far,3,8:00,9:40,,{MAX_WEEK_OFFSET + 1}\n"
+        f"Huge,3,8:00,9:40,,{2 ** 40}\n"
+    )
+    store = CourseStore()
+    report = import_csv(source, store, chunk_size=3)
+    assert report['rows_read'] == 8 and report['rows_imported'] == 1 and report['rows_rejected'] == 7
+    assert report['rejected'] == [
+        (2, "missing course name"), (3, "invalid day"), (4, "end is not after start"), (5, "outside 8:00-21:00"),
+        (6, "invalid week offset"), (7, "week offset out of range"), (8, "week offset out of range"),
+    ]
+    assert store.week_courses(0) == [("Math", 1, 480, 580, "A1", 0)]
+
+
+def test_csv_missing_columns_raise():
+    with pytest.raises(ValueError, match="missing column"):
+        import_csv(io.StringIO("Course,Day\nMath,1\n"), CourseStore())
+
+
+@pytest.mark.parametrize("rrule, start_day, expected", [
+    ("FREQ=DAILY;COUNT=7", 3, 7),
+    ("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4", 3, 4),
+    ("FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=2", 3, 2),
+    ("FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;COUNT=5", 2, 5),
+])
+def test_rrule_count_is_exact(rrule, start_day, expected):
+    store = CourseStore()
+    report = import_ics(ics({"SUMMARY": "Math", "DTSTART": stamp(1, start_day, "8:00"), "DTEND": stamp(1, start_day, "9:40"),
+                             "RRULE": rrule}), store)
+    assert report['series_imported'] == 1
+    courses = occurrences(store)
+    assert len(courses) == expected
+    assert min((week, day) for _, day, _, _, _, week in courses) == (1, start_day)  # Nothing before DTSTART
+
+
+def test_rrule_until_and_exdate():
+    store = CourseStore()
+    import_ics(ics({"SUMMARY": "Math", "DTSTART": stamp(0, 2, "8:00"), "DTEND": stamp(0, 2, "9:40"),
+                    "RRULE": f"FREQ=WEEKLY;BYDAY=TU,TH;UNTIL={stamp(2, 2, '8:00')}", "EXDATE": stamp(1, 4, "8:00")}), store)
+    assert [(week, day) for _, day, _, _, _, week in occurrences(store)] == [(0, 2), (0, 4), (1, 2), (2, 2)]
+
+
+def test_unsupported_and_malformed_rrules_are_rejected():
+    store = CourseStore()
+    report = import_ics(ics(
+        {"SUMMARY": "Monthly", "DTSTART": stamp(0, 1, "8:00"), "RRULE": "FREQ=MONTHLY"},
+        {"SUMMARY": "Off pattern", "DTSTART": stamp(0, 1, "8:00"), "RRULE": "FREQ=WEEKLY;BYDAY=TU"},
+        {"SUMMARY": "Bad count", "DTSTART": stamp(0, 1, "8:00"), "RRULE": "FREQ=WEEKLY;COUNT=x"},
+        {"SUMMARY": "Evening", "DTSTART": stamp(0, 1, "21:00"), "DTEND": stamp(0, 1, "22:00"), "RRULE": "FREQ=WEEKLY"},
+    ), store)
+    assert report['rows_rejected'] == 4 and not store.series()
+
+
+def test_utc_times_are_converted_to_the_import_timezone():
+    utc_plus_8 = timezone(timedelta(hours=8))
+    store = CourseStore()
+    report = import_ics(ics(
+        {"SUMMARY": "Single", "DTSTART": stamp(0, 1, "0:30", utc=True), "DTEND": stamp(0, 1, "2:10", utc=True)},
+        {"SUMMARY": "Weekly", "DTSTART": stamp(0, 2, "1:00", utc=True), "DTEND": stamp(0, 2, "2:40", utc=True),
+         "RRULE": "FREQ=WEEKLY;COUNT=2"},
+        {"SUMMARY": "Floating", "DTSTART": stamp(0, 3, "9:00"), "DTEND": stamp(0, 3, "10:00")},
+    ), store, tz=utc_plus_8)
+    assert report['rows_rejected'] == 0
+    assert sorted(store.week_courses(0)) == [
+        ("Floating", 3, 540, 600, "", 0), ("Single", 1, 510, 610, "", 0), ("Weekly", 2, 540, 640, "", 0),
+    ]
+
+
+def test_utc_time_can_move_a_course_to_another_day():
+    store = CourseStore()
+    sunday_evening_utc = stamp(0, 7, "23:00", utc=True)
+    import_ics(ics({"SUMMARY": "Math", "DTSTART": sunday_evening_utc, "DTEND": stamp(0, 7, "23:50", utc=True)}),
+               store, tz=timezone(timedelta(hours=10)))
+    assert store.week_courses(1) == [("Math", 1, 540, 590, "", 1)]
+
+
+def test_nested_alarm_properties_do_not_override_the_event():
+    source = io.StringIO("\r\n".join([
+        "BEGIN:VCALENDAR", "BEGIN:VEVENT", f"DTSTART:{stamp(0, 1, '8:00')}", "SUMMARY:Math", "LOCATION:A1",
+        "BEGIN:VALARM", "ACTION:EMAIL", "SUMMARY:Alarm notification", "DESCRIPTION:Reminder", "TRIGGER:-P0DT0H30M0S", "END:VALARM",
+        f"DTEND:{stamp(0, 1, '9:40')}", "END:VEVENT", "END:VCALENDAR",
+    ]) + "\r\n")
+    store = CourseStore()
+    import_ics(source, store)
+    assert store.week_courses(0) == [("Math", 1, 480, 580, "A1", 0)]
@@ -0,0 +1,52 @@
+import random
+
+from gen_file import _sweep_overlaps, find_clashes
+
+
+def brute_force_clashes(courses):
+    """Clusters of courses overlapping directly or through each other, by repeated merging."""
+    groups = [{i} for i in range(len(courses))]
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(groups)):
+            for b in range(a + 1, len(groups)):
+                if any(courses[i][1] == courses[j][1] and courses[i][2] < courses[j][3] and courses[j][2] < courses[i][3]
+                       for i in groups[a] for j in groups[b]):
+                    groups[a] |= groups.pop(b)
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(sorted(group) for group in groups if len(group) > 1)
+
+
+def test_touching_courses_do_not_clash():
+    courses = [("A", 1, "8:00", "9:40", "", 0), ("B", 1, "9:40", "11:00", "", 0), ("C", 2, "8:00", "9:40", "", 0)]
+    lanes, groups = _sweep_overlaps(courses)
+    assert lanes == [(0, 1), (0, 1), (0, 1)]
+    assert find_clashes(courses) == []
+
+
+def test_chained_overlaps_form_one_group_and_reuse_lanes():
+    courses = [("A", 1, "8:00", "10:00", "", 0), ("B", 1, "9:00", "11:00", "", 0), ("C", 1, "10:30", "12:00", "", 0),
+               ("D", 1, "13:00", "14:00", "", 0)]
+    lanes, _ = _sweep_overlaps(courses)
+    assert lanes == [(0, 2), (1, 2), (0, 2), (0, 1)]  # C takes A's lane once A has ended
+    assert find_clashes(courses) == [courses[:3]]
+
+
+def test_sweep_matches_brute_force_on_random_weeks():
+    rng = random.Random(0)
+    for _ in range(50):
+        courses = []
+        for i in range(rng.randint(1, 40)):
+            start = rng.randrange(8 * 60, 20 * 60, 10)
+            courses.append((f"Course {i}", rng.randint(1, 3), start, start + rng.choice((30, 50, 100)), "", 0))
+        lanes, groups = _sweep_overlaps(courses)
+        assert sorted(sorted(group) for group in groups if len(group) > 1) == brute_force_clashes(courses)
+        for i, (lane, lane_count) in enumerate(lanes):
+            assert 0 <= lane < lane_count
+            for j in range(i):  # Overlapping courses never share a lane
+                if courses[i][1] == courses[j][1] and courses[i][2] < courses[j][3] and courses[j][2] < courses[i][3]:
+                    assert lane != lanes[j][0]
@@ -0,0 +1,47 @@
+from course_store import CourseStore, RecurrenceRule
+
+
+def test_recurrence_rule_expands_only_its_weeks():
+    rule = RecurrenceRule("Math", "1,3", "8:00", "9:40", "A1", first_week=2, interval=2, count=3)
+    assert [week for week in range(0, 10) if rule.expand(week)] == [2, 4, 6]
+    assert rule.expand(4) == (("Math", 1, 480, 580, "A1", 4), ("Math", 3, 480, 580, "A1", 4))
+    assert rule.to_rrule() == "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=6"
+
+
+def test_recurrence_rule_skips_exceptions_and_runs_forever_without_count():
+    rule = RecurrenceRule("Math", [3, 1, 9], "8:00", "9:40", exceptions={(5, 1)})
+    assert rule.days == (1, 3)
+    assert [occurrence[1] for occurrence in rule.expand(5)] == [3]
+    assert len(rule.expand(10 ** 4)) == 2
+    assert rule.expand(-1) == ()
+
+
+def test_replace_week_detaches_edited_occurrences_and_excepts_deleted_ones():
+    store = CourseStore()
+    series_id = store.add_series(RecurrenceRule("Math", "1,3,5", "8:00", "9:40"))
+    frame = store.week_frame(2)
+    assert frame["Series"].tolist() == [series_id] * 3
+    rows = frame.values.tolist()
+    rows[1][3] = "10:00"  # Wednesday edited: becomes a single course
+    del rows[2]  # Friday deleted: becomes an exception of the series
+    store.replace_week(2, rows)
+
+    assert sorted(store.week_courses(2)) == [("Math", 1, 480, 580, "", 2), ("Math", 3, 480, 600, "", 2)]
+    assert store.series()[series_id].exceptions == {(2, 3), (2, 5)}
+    assert len(store.week_courses(1)) == 3  # Other weeks of the series are untouched
+
+
+def test_replace_series_updates_adds_and_drops_by_id():
+    store = CourseStore()
+    kept = store.add_series(RecurrenceRule("Math", "1", "8:00", "9:40", exceptions={(0, 1)}))
+    dropped = store.add_series(RecurrenceRule("Phys", "2", "8:00", "9:40"))
+    assert len(store.week_courses(1)) == 2  # Expanded and cached before the edit
+    rows = store.series_frame().values.tolist()
+    rows[0][1] = "1,2"
+    rows = [rows[0], ["Chem", "4", "13:00", "14:40", "", 0, 1, None, None]]
+    store.replace_series(rows)
+
+    series = store.series()
+    assert dropped not in series and len(series) == 2
+    assert series[kept].days == (1, 2) and series[kept].exceptions == {(0, 1)}
+    assert sorted(course[0] for course in store.week_courses(1)) == ["Chem", "Math", "Math"]
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from render_service import MAX_COURSES, RenderService, RequestError, job_key, parse_job
+
+COURSE = ["Math", 1, "8:00", "9:40", "A1"]
+
+
+def test_parse_job_normalizes_courses():
+    courses, style, _, scale, output_format, colors = parse_job({
+        'courses': [COURSE, {'course': "Phys", 'day': "2", 'start': "10:00", 'end': "11:40"}],
+        'format': 'PNG', 'course_colors': {'Math': '#A8DADC'},
+    })
+    assert courses == (("Math", 1, 480, 580, "A1", 0), ("Phys", 2, 600, 700, "", 0))
+    assert (style, scale, output_format, colors) == ('fresh', 1.0, 'png', (('Math', '#A8DADC'),))
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {'style': 'nope', 'courses': []},
+    {'format': 'gif', 'courses': []},
+    {'scale': 100, 'courses': []},
+    {'scale': 'big', 'courses': []},
+    {'course_colors': {'Math': 'red'}, 'courses': []},
+    {'courses': 'Math'},
+    {'courses': [COURSE] * (MAX_COURSES + 1)},
+    {'courses': [["", 1, "8:00", "9:40"]]},
+    {'courses': [["Math", True, "8:00", "9:40"]]},
+    {'courses': [["Math", 3.5, "8:00", "9:40"]]},
+    {'courses': [["Math", 8, "8:00", "9:40"]]},
+    {'courses': [["Math", 1, "7:00", "9:40"]]},
+    {'courses': [["Math", 1, "9:40", "8:00"]]},
+    {'courses': [["Math", 1, "8:00", "8:05"]]},
+    {'courses': [["Math", 1, "8:00"]]},
+])
+def test_parse_job_rejects_bad_requests(payload):
+    with pytest.raises(RequestError):
+        parse_job(payload)
+
+
+def test_identical_requests_render_once():
+    service = RenderService(workers=1)
+    try:
+        job = parse_job({'courses': [COURSE], 'format': 'svg'})
+        assert job_key(job) == job_key(parse_job({'courses': [COURSE], 'format': 'svg'}))
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: service.render(job), range(4)))
+        assert len({data for data, _ in results}) == 1 and results[0][0].startswith(b'<')
+        assert [how for _, how in results].count('rendered') == 1  # The others were coalesced or cache hits
+        assert service.render(job)[1] == 'hit'
+        assert service.stats()['renders'] == 1
+    finally:
+        service.shutdown()
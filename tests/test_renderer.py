@@ -0,0 +1,49 @@
+import random
+
+import pytest
+from PIL import ImageChops
+
+from gen_file import TimetableRenderer, generate_timetable_image
+
+
+def random_course(rng, index):
+    start = rng.randrange(8 * 60, 19 * 60, 10)
+    end = start + rng.choice((50, 90, 120))
+    return (f"Course {rng.randint(0, 12)}", rng.randint(1, 7), f"{start // 60}:{start % 60:02d}", f"{end // 60}:{end % 60:02d}", f"Room {index}", 0)
+
+
+def assert_same_image(a, b):
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+@pytest.mark.parametrize("selected_style, scale", [('cool', 1.0), ('fresh', 0.75)])
+def test_incremental_render_matches_full_render(selected_style, scale):
+    """Edits, additions and removals (including clashing courses sharing a column) repaint only dirty columns."""
+    rng = random.Random(3)
+    courses = [random_course(rng, i) for i in range(30)]
+    renderer = TimetableRenderer()
+    renderer.render(courses, selected_style, "03-02 to 03-08", scale)
+    for step in range(30):
+        courses = list(courses)
+        edit = rng.random()
+        if edit < 0.4:
+            courses[rng.randrange(len(courses))] = random_course(rng, 100 + step)
+        elif edit < 0.7:
+            courses.append(random_course(rng, 200 + step))
+        else:
+            courses.pop(rng.randrange(len(courses)))
+        frame = renderer.render(courses, selected_style, "03-02 to 03-08", scale)
+        expected = generate_timetable_image(courses, selected_style, week_date_range="03-02 to 03-08", scale=scale,
+                                            course_colors=renderer.course_colors)
+        assert_same_image(frame, expected)
+
+
+def test_unchanged_courses_reuse_the_frame_and_new_settings_render_in_full():
+    rng = random.Random(5)
+    courses = [random_course(rng, i) for i in range(10)]
+    renderer = TimetableRenderer()
+    frame = renderer.render(courses, 'fresh', "a")
+    assert renderer.render(list(courses), 'fresh', "a") is frame
+    for settings in (('cute', "a"), ('cute', "b")):
+        assert_same_image(renderer.render(courses, *settings),
+                          generate_timetable_image(courses, settings[0], week_date_range=settings[1], course_colors=renderer.course_colors))
@@ -0,0 +1,56 @@
+import random
+
+from gen_file import STYLES, _measure_draw, get_text_size, load_fonts, wrap_text
+
+
+def greedy_wrap(draw, text, font, max_width):
+    """The original wrap_text: re-measures the line after every word (or character of an over-long word)."""
+    lines = []
+    current_line = []
+    for word in text.split(' '):
+        if get_text_size(draw, ' '.join(current_line + [word]), font)[0] <= max_width:
+            current_line.append(word)
+            continue
+        if current_line:
+            lines.append(' '.join(current_line))
+        current_line = [word]
+        if get_text_size(draw, word, font)[0] > max_width:
+            sub_word_line = []
+            for char in word:
+                if get_text_size(draw, ''.join(sub_word_line + [char]), font)[0] <= max_width:
+                    sub_word_line.append(char)
+                else:
+                    if sub_word_line:
+                        lines.append(''.join(sub_word_line))
+                    sub_word_line = [char]
+            if sub_word_line:
+                lines.append(''.join(sub_word_line))
+            current_line = []
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def random_text(rng):
+    words = []
+    for _ in range(rng.randint(1, 12)):
+        if rng.random() < 0.3:
+            words.append("".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(rng.randint(1, 30))))
+        else:
+            words.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJ0123456789-()") for _ in range(rng.randint(1, 14))))
+    return " ".join(words)
+
+
+def test_wrap_text_matches_greedy_wrap():
+    rng = random.Random(0)
+    fonts = load_fonts(STYLES['fresh'])[2:4] + load_fonts(STYLES['modern'], 2.0)[2:4]
+    for _ in range(400):
+        text, font, max_width = random_text(rng), rng.choice(fonts), rng.randint(20, 300)
+        assert wrap_text(_measure_draw, text, font, max_width) == greedy_wrap(_measure_draw, text, font, max_width), text
+
+
+def test_wrap_text_edge_cases():
+    font = load_fonts(STYLES['fresh'])[2]
+    assert wrap_text(_measure_draw, "", font, 100) == []
+    for text in ("a  b", " leading", "trailing ", "x" * 50):
+        assert wrap_text(_measure_draw, text, font, 40) == greedy_wrap(_measure_draw, text, font, 40)
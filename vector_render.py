@@ -0,0 +1,175 @@
+"""Vector (SVG / PDF) backend for the timetable.
+
+Uses the same layout as the raster renderer in gen_file (layout_base_layer / layout_courses),
+so grid, rounded course blocks, shadows and wrapped text end up in the same places.
+"""
+import zlib
+from xml.sax.saxutils import escape
+
+from gen_file import (
+    STYLES, SHADOW_COLOR, assign_course_colors, get_image_size, get_shadow_metrics,
+    layout_base_layer, layout_courses,
+)
+
+PDF_SHADOW_LAYERS = 4  # PDF has no blur, so shadows are built from stacked translucent blocks
+BEZIER_KAPPA = 0.5523  # Control point distance for approximating a quarter circle
+
+
+def render_vector(courses, selected_style='fresh', week_date_range="", scale=1.0, course_colors=None, output_format='svg'):
+    """Render the timetable as an SVG string or vector PDF bytes."""
+    style = STYLES[selected_style]
+    width, height = get_image_size(scale)
+    course_colors = assign_course_colors(courses, style['palette'], dict(course_colors or {}))
+    texts, lines = layout_base_layer(selected_style, width, height, week_date_range, scale)
+    blocks = list(layout_courses(courses, selected_style, course_colors, width, height, scale))
+
+    if output_format == 'svg':
+        return _render_svg(style, width, height, texts, lines, blocks, scale)
+    if output_format == 'pdf':
+        return _render_pdf(style, width, height, texts, lines, blocks, scale)
+    raise ValueError(f"Unknown vector format: {output_format!r}")
+
+
+def _baseline(y, font):
+    """Layout positions are the top-left corner as in Pillow; vector text is placed on its baseline."""
+    if hasattr(font, 'getmetrics'):
+        return y + font.getmetrics()[0]
+    return y + font.getbbox("A")[3]
+
+
+def _font_size(font):
+    return getattr(font, 'size', 10)
+
+
+# =========== SVG ===========
+def _svg_text(x, y, text, font, color, bold):
+    family = font.getname()[0] if hasattr(font, 'getname') else "sans-serif"
+    weight = ' font-weight="bold"' if bold else ''
+    return (f'<text x="{x:.2f}" y="{_baseline(y, font):.2f}" font-family="{escape(family)}, Helvetica, Arial, sans-serif" '
+            f'font-size="{_font_size(font)}"{weight} fill="{color}">{escape(text)}</text>')
+
+
+def _render_svg(style, width, height, texts, lines, blocks, scale):
+    offset, blur_radius = get_shadow_metrics(scale)
+    shadow_opacity = SHADOW_COLOR[3] / 255
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+        '<defs>',
+        f'<linearGradient id="bg" x1="0" y1="0" x2="0" y2="1"><stop offset="0" stop-color="{style["bg_colors"][0]}"/>'
+        f'<stop offset="1" stop-color="{style["bg_colors"][1]}"/></linearGradient>',
+        f'<filter id="shadow" filterUnits="userSpaceOnUse" x="0" y="0" width="{width}" height="{height}">'
+        f'<feGaussianBlur stdDeviation="{blur_radius}"/></filter>',
+        '</defs>',
+        f'<rect width="{width}" height="{height}" fill="{style["bg_colors"][0]}"/>', # For viewers without gradients
+        f'<rect width="{width}" height="{height}" fill="url(#bg)"/>',
+    ]
+    parts += [_svg_text(*text) for text in texts]
+    parts += [f'<line x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}" stroke="{color}" stroke-width="{line_width}"/>'
+              for x1, y1, x2, y2, color, line_width in lines]
+
+    for (x1, y1, x2, y2), radius, color, block_texts in blocks:
+        parts.append(f'<rect x="{x1:.2f}" y="{y1 + offset:.2f}" width="{x2 - x1:.2f}" height="{y2 - y1:.2f}" rx="{radius}" '
+                     f'fill="#000" fill-opacity="{shadow_opacity:.3f}" filter="url(#shadow)"/>')
+        parts.append(f'<rect x="{x1:.2f}" y="{y1:.2f}" width="{x2 - x1:.2f}" height="{y2 - y1:.2f}" rx="{radius}" fill="{color}"/>')
+        parts += [_svg_text(*text) for text in block_texts]
+
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+# =========== PDF ===========
+def _pdf_color(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return ' '.join(f"{int(hex_color[i:i + 2], 16) / 255:.4f}" for i in (0, 2, 4))
+
+
+def _pdf_string(text):
+    # Base-14 fonts only cover WinAnsi; characters outside it (e.g. CJK) become '?'
+    data = text.encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _pdf_rounded_rect(x1, y1, x2, y2, radius):
+    """Path operators for a rounded rectangle in the page's top-down coordinates."""
+    r = max(0, min(radius, (x2 - x1) / 2, (y2 - y1) / 2))
+    k = r * BEZIER_KAPPA
+    return (
+        f"{x1 + r:.2f} {y1:.2f} m {x2 - r:.2f} {y1:.2f} l "
+        f"{x2 - r + k:.2f} {y1:.2f} {x2:.2f} {y1 + r - k:.2f} {x2:.2f} {y1 + r:.2f} c "
+        f"{x2:.2f} {y2 - r:.2f} l "
+        f"{x2:.2f} {y2 - r + k:.2f} {x2 - r + k:.2f} {y2:.2f} {x2 - r:.2f} {y2:.2f} c "
+        f"{x1 + r:.2f} {y2:.2f} l "
+        f"{x1 + r - k:.2f} {y2:.2f} {x1:.2f} {y2 - r + k:.2f} {x1:.2f} {y2 - r:.2f} c "
+        f"{x1:.2f} {y1 + r:.2f} l "
+        f"{x1:.2f} {y1 + r - k:.2f} {x1 + r - k:.2f} {y1:.2f} {x1 + r:.2f} {y1:.2f} c h"
+    )
+
+
+def _pdf_text(x, y, text, font, color, bold):
+    font_name = '/F2' if bold else '/F1'
+    # The page is flipped to top-down coordinates, so flip the text matrix back
+    return (f"{_pdf_color(color)} rg BT {font_name} {_font_size(font)} Tf 1 0 0 -1 {x:.2f} {_baseline(y, font):.2f} Tm ".encode()
+            + _pdf_string(text) + b" Tj ET")
+
+
+def _render_pdf(style, width, height, texts, lines, blocks, scale):
+    offset, blur_radius = get_shadow_metrics(scale)
+    # Layer alphas that add up to roughly the raster shadow's opacity in the middle of the block
+    layer_alpha = 1 - (1 - SHADOW_COLOR[3] / 255) ** (1 / PDF_SHADOW_LAYERS)
+
+    ops = [f"1 0 0 -1 0 {height} cm".encode(), b"q /Sh0 sh Q"]
+    ops += [_pdf_text(*text) for text in texts]
+    for x1, y1, x2, y2, color, line_width in lines:
+        ops.append(f"{_pdf_color(color)} RG {line_width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S".encode())
+
+    for (x1, y1, x2, y2), radius, color, block_texts in blocks:
+        ops.append(b"q /GS1 gs 0 0 0 rg")
+        for layer in range(PDF_SHADOW_LAYERS):
+            grow = blur_radius * (1 - 2 * layer / PDF_SHADOW_LAYERS) # From blur_radius outside to half of it inside
+            ops.append(_pdf_rounded_rect(x1 - grow, y1 + offset - grow, x2 + grow, y2 + offset + grow, radius + max(0, grow)).encode() + b" f")
+        ops.append(b"Q")
+        ops.append(f"{_pdf_color(color)} rg ".encode() + _pdf_rounded_rect(x1, y1, x2, y2, radius).encode() + b" f")
+        ops += [_pdf_text(*text) for text in block_texts]
+
+    content = zlib.compress(b"\n".join(ops))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] /Contents 4 0 R "
+         f"/Resources << /Font << /F1 5 0 R /F2 6 0 R >> /ExtGState << /GS1 << /ca {layer_alpha:.4f} >> >> "
+         f"/Shading << /Sh0 << /ShadingType 2 /ColorSpace /DeviceRGB /Coords [0 0 0 {height}] "
+         f"/Function << /FunctionType 2 /Domain [0 1] /C0 [{_pdf_color(style['bg_colors'][0])}] "
+         f"/C1 [{_pdf_color(style['bg_colors'][1])}] /N 1 >> /Extend [true true] >> >> >> >>").encode(),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def pdf_supports_text(strings):
+    """True if every string can be shown with the PDF backend's built-in fonts (no CJK, emoji, ...)."""
+    try:
+        for text in strings:
+            text.encode('cp1252')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def can_render_pdf(courses, week_date_range=""):
+    """True if a vector PDF can show these courses and title; otherwise fall back to a raster PDF.
+
+    Vector PDFs are much smaller, but their built-in fonts can't show e.g. Chinese text.
+    """
+    return pdf_supports_text([week_date_range] + [f"{c[0]} {c[4]}" for c in courses])